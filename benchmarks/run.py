@@ -0,0 +1,383 @@
+"""
+Load-test every endpoint of the app and report latency percentiles and throughput as JSON.
+
+Usage: `python -m benchmarks.run [--students N] [--scores-per-student N] [--requests N] [--concurrency N]
+[--output FILE] [--baseline FILE]`
+
+The app runs in-process behind an httpx ASGI transport, so no server has to be started. Each run creates a
+throwaway database next to the one given by `--database-url` (by default the one of the DB_* settings),
+migrates it to the latest revision, seeds it with random students and scores and drops it afterwards.
+Runs with the same `--seed` use the same data and request sequence, so their reports can be diffed.
+"""
+import argparse
+import asyncio
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import orjson
+from sqlalchemy import text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+ROOT = Path(__file__).resolve().parent.parent
+
+T = TypeVar("T")
+
+# (url, keyword arguments of `httpx.AsyncClient.request`)
+Call = Tuple[str, Dict[str, Any]]
+
+
+@dataclass
+class State:
+    """Ids of the seeded data and of the rows created by the write scenarios."""
+
+    rng: random.Random
+    student_ids: List[int]
+    score_ids: List[int]
+    created_students: List[int] = field(default_factory=list)
+    created_scores: List[int] = field(default_factory=list)
+    counter: int = 0
+
+    def student_id(self) -> int:
+        return self.rng.choice(self.student_ids)
+
+    def score_id(self) -> int:
+        return self.rng.choice(self.score_ids)
+
+    def next_email(self) -> str:
+        self.counter += 1
+        return f"bench-{self.counter}@example.com"
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    build: Callable[[State], Call]
+    status: int = 200
+    collect: Optional[Callable[[State, Any], None]] = None
+    # Called with the client, the state and the number of requests about to be made, before the scenario runs.
+    prepare: Optional[Callable[[Any, State, int], Awaitable[None]]] = None
+
+
+def _page_cursor(state: State) -> str:
+    from src.pagination import encode_cursor
+
+    return encode_cursor(state.student_id())
+
+
+def _bulk_scores(state: State) -> Call:
+    body = b"".join(
+        orjson.dumps({"score": state.rng.randint(0, 100), "student_id": state.student_id()}) + b"\n"
+        for _ in range(100)
+    )
+    return "/score/bulk", {"content": body, "headers": {"Content-Type": "application/x-ndjson"}}
+
+
+def _class_ids(state: State) -> List[int]:
+    # A class worth of students, as read by a teacher's dashboard.
+    return state.rng.sample(state.student_ids, min(30, len(state.student_ids)))
+
+
+async def _spare_students(client, state: State, count: int) -> None:
+    # The deletes consume what the creates added; top it up when they did not run (`--only`) or failed.
+    missing = count - len(state.created_students)
+    if missing <= 0:
+        return
+    rows = [{"first_name": "Bench", "last_name": "Spare", "email": state.next_email()} for _ in range(missing)]
+    response = await client.post("/student/bulk", json=rows)
+    response.raise_for_status()
+    state.created_students.extend(row["id"] for row in response.json()["results"] if row["id"] is not None)
+
+
+async def _spare_scores(client, state: State, count: int) -> None:
+    missing = count - len(state.created_scores)
+    if missing <= 0:
+        return
+    rows = [{"score": state.rng.randint(0, 100), "student_id": state.student_id()} for _ in range(missing)]
+    response = await client.post("/score/bulk", json=rows)
+    response.raise_for_status()
+    state.created_scores.extend(row["id"] for row in response.json()["results"] if row["id"] is not None)
+
+
+# Reads run first so they are measured against the seeded data only; deletes remove what the creates added.
+SCENARIOS = [
+    Scenario("GET /student/", "GET", lambda s: ("/student/", {"params": {"cursor": _page_cursor(s)}})),
+    Scenario("GET /student/search", "GET", lambda s: ("/student/search", {"params": {"q": f"{s.student_id():03d}"}})),
+    Scenario("GET /student/{student_id}", "GET", lambda s: (f"/student/{s.student_id()}", {})),
+    Scenario(
+        "GET /student/{student_id}?include_scores=false", "GET",
+        lambda s: (f"/student/{s.student_id()}", {"params": {"include_scores": "false"}}),
+    ),
+    Scenario(
+        "GET /student/batch", "GET",
+        lambda s: ("/student/batch", {"params": {"ids": ",".join(map(str, _class_ids(s)))}}),
+    ),
+    Scenario("POST /student/batch", "POST", lambda s: ("/student/batch", {"json": {"ids": _class_ids(s)}})),
+    Scenario("GET /student/{student_id}/stats", "GET", lambda s: (f"/student/{s.student_id()}/stats", {})),
+    Scenario("GET /student/{student_id}/scores", "GET", lambda s: (f"/student/{s.student_id()}/scores", {})),
+    Scenario("GET /score/", "GET", lambda s: ("/score/", {"params": {"student_id": s.student_id()}})),
+    Scenario("GET /score/{score_id}", "GET", lambda s: (f"/score/{s.score_id()}", {})),
+    Scenario("GET /analytics/distribution", "GET", lambda s: ("/analytics/distribution", {})),
+    Scenario("GET /analytics/rank/{student_id}", "GET", lambda s: (f"/analytics/rank/{s.student_id()}", {})),
+    Scenario(
+        "POST /student/", "POST",
+        lambda s: ("/student/", {"json": {"first_name": "Bench", "last_name": "Student", "email": s.next_email()}}),
+        collect=lambda s, body: s.created_students.append(body["id"]),
+    ),
+    Scenario(
+        "PATCH /student/{student_id}", "PATCH",
+        lambda s: (f"/student/{s.student_id()}", {"json": {"first_name": f"First {s.rng.randint(0, 10 ** 6)}"}}),
+    ),
+    Scenario(
+        "POST /score/", "POST",
+        lambda s: ("/score/", {"json": {"score": s.rng.randint(0, 100), "student_id": s.student_id()}}),
+        collect=lambda s, body: s.created_scores.append(body["id"]),
+    ),
+    Scenario(
+        "PATCH /score/{score_id}", "PATCH",
+        lambda s: (f"/score/{s.score_id()}", {"json": {"score": s.rng.randint(0, 100)}}),
+    ),
+    Scenario("POST /score/bulk", "POST", _bulk_scores),
+    Scenario(
+        "DELETE /score/{score_id}", "DELETE", lambda s: (f"/score/{s.created_scores.pop()}", {}),
+        prepare=_spare_scores,
+    ),
+    Scenario(
+        "DELETE /student/{student_id}", "DELETE", lambda s: (f"/student/{s.created_students.pop()}", {}),
+        prepare=_spare_students,
+    ),
+]
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    # Nearest-rank percentile of an ascending list.
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+async def _run_scenario(client, scenario: Scenario, state: State, requests: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal errors, remaining
+        while remaining > 0:
+            remaining -= 1
+            url, kwargs = scenario.build(state)
+            started = time.perf_counter()
+            response = await client.request(scenario.method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != scenario.status:
+                errors += 1
+            elif scenario.collect is not None:
+                scenario.collect(state, response.json())
+
+    started, cpu_started = time.perf_counter(), time.process_time()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "requests_per_second": round(len(ordered) / elapsed, 2),
+        # CPU time of this process (app, driver and client) per request; the database server is not included.
+        "cpu_ms_per_request": round(1000 * cpu / len(ordered), 3),
+        "mean_ms": round(1000 * sum(ordered) / len(ordered), 3),
+        "p50_ms": round(1000 * _percentile(ordered, 50), 3),
+        "p95_ms": round(1000 * _percentile(ordered, 95), 3),
+        "p99_ms": round(1000 * _percentile(ordered, 99), 3),
+        "max_ms": round(1000 * ordered[-1], 3),
+    }
+
+
+async def seed_database(students: int, scores_per_student: int, seed: int) -> Tuple[List[int], List[int]]:
+    from src.database import async_session_maker
+    from src.students.stats import rebuild_stats
+
+    async with async_session_maker() as session:
+        # setseed() makes the random() calls below repeatable on the same connection.
+        await session.execute(text("SELECT setseed(:seed)"), {"seed": (seed % 1000) / 1000})
+        await session.execute(
+            text(
+                "INSERT INTO students (first_name, last_name, email) "
+                "SELECT 'First ' || i, 'Last ' || i, 'student-' || i || '@example.com' "
+                "FROM generate_series(1, :students) AS i"
+            ),
+            {"students": students},
+        )
+        await session.execute(
+            text(
+                "INSERT INTO scores (score, student_id, created_at) "
+                "SELECT floor(random() * 101)::int, s.id, now() - random() * interval '365 days' "
+                "FROM students AS s CROSS JOIN generate_series(1, :per_student) "
+                "ORDER BY random()"
+            ),
+            {"per_student": scores_per_student},
+        )
+        await session.commit()
+        await rebuild_stats(session)
+
+        student_ids = list((await session.execute(text("SELECT id FROM students ORDER BY id"))).scalars())
+        score_ids = list((await session.execute(text("SELECT id FROM scores ORDER BY id"))).scalars())
+    return student_ids, score_ids
+
+
+async def _benchmark(args: argparse.Namespace) -> Dict[str, dict]:
+    import httpx
+
+    from src.main import app
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    # The ASGI transport does not run the lifespan, which connects the database.
+    async with app.router.lifespan_context(app):
+        student_ids, score_ids = await seed_database(args.students, args.scores_per_student, args.seed)
+        state = State(random.Random(args.seed), student_ids, score_ids)
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for scenario in SCENARIOS:
+                if args.only and not any(part in scenario.name for part in args.only):
+                    continue
+                if scenario.prepare is not None:
+                    await scenario.prepare(client, state, args.warmup + args.requests)
+                if args.warmup:
+                    await _run_scenario(client, scenario, state, args.warmup, args.concurrency)
+                results[scenario.name] = await _run_scenario(
+                    client, scenario, state, args.requests, args.concurrency
+                )
+                print(f"{scenario.name}: {results[scenario.name]}", file=sys.stderr)
+    return results
+
+
+async def _create_database(admin_url: URL, name: str) -> None:
+    admin = create_async_engine(admin_url, isolation_level="AUTOCOMMIT")
+    async with admin.connect() as connection:
+        await connection.execute(text(f'CREATE DATABASE "{name}"'))
+    await admin.dispose()
+
+
+async def _drop_database(admin_url: URL, name: str) -> None:
+    admin = create_async_engine(admin_url, isolation_level="AUTOCOMMIT")
+    async with admin.connect() as connection:
+        await connection.execute(text(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)'))
+    await admin.dispose()
+
+
+def _migrate() -> None:
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, check=True)
+
+
+def add_database_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--database-url", default=_default_database_url(),
+                        help="A Postgres database on the server to benchmark against; only used to create "
+                             "and drop the throwaway database.")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--scores-per-student", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Do not drop the benchmark database afterwards.")
+
+
+def run_in_throwaway_database(
+        args: argparse.Namespace,
+        benchmark: Callable[[argparse.Namespace], Awaitable[T]]
+) -> T:
+    """Create and migrate a database next to `args.database_url`, run `benchmark` against it and drop it."""
+    admin_url = make_url(args.database_url)
+    name = f"gradebook_bench_{uuid.uuid4().hex[:8]}"
+    asyncio.run(_create_database(admin_url, name))
+    try:
+        # The app reads its settings on import, so the URL has to be in place before anything imports `src`.
+        os.environ["DATABASE_URL"] = admin_url.set(database=name).render_as_string(hide_password=False)
+        os.environ.setdefault("SECRET_KEY", "benchmark")
+        _migrate()
+        return asyncio.run(benchmark(args))
+    finally:
+        if not args.keep:
+            asyncio.run(_drop_database(admin_url, name))
+
+
+def _default_database_url() -> str:
+    if os.environ.get("DATABASE_URL"):
+        return os.environ["DATABASE_URL"]
+    return str(URL.create(
+        "postgresql+asyncpg",
+        username=os.environ.get("DB_USER"),
+        password=os.environ.get("DB_PASSWORD"),
+        host=os.environ.get("DB_HOST", "localhost"),
+        port=int(os.environ.get("DB_PORT", "5432")),
+        database=os.environ.get("DB_NAME", "postgres"),
+    ).render_as_string(hide_password=False))
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(report: dict, baseline: dict) -> None:
+    print(f"{'scenario':<48} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>9} {'cpu':>9}", file=sys.stderr)
+    for name, result in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        changes = [
+            f"{100 * (result[key] - before[key]) / before[key]:+8.1f}%" if before.get(key) else f"{'n/a':>9}"
+            for key in ("p50_ms", "p95_ms", "p99_ms", "requests_per_second", "cpu_ms_per_request")
+        ]
+        print(f"{name:<48} {' '.join(changes)}", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.strip().splitlines()[0])
+    add_database_arguments(parser)
+    parser.add_argument("--requests", type=int, default=1000, help="Measured requests per scenario.")
+    parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests per scenario.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--only", action="append", help="Only run scenarios whose name contains this text.")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here instead of to stdout.")
+    parser.add_argument("--baseline", type=Path, help="A previous report to print the relative changes against.")
+    args = parser.parse_args()
+
+    results = run_in_throwaway_database(args, _benchmark)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "students": args.students,
+            "scores_per_student": args.scores_per_student,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "scenarios": results,
+    }
+    output = orjson.dumps(report, option=orjson.OPT_INDENT_2)
+    if args.output:
+        args.output.write_bytes(output)
+    else:
+        sys.stdout.buffer.write(output + b"\n")
+
+    if args.baseline:
+        _compare(report, orjson.loads(args.baseline.read_bytes()))
+
+
+if __name__ == "__main__":
+    main()
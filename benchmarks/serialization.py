@@ -0,0 +1,113 @@
+"""
+Compare the CPU time per response of the read endpoints before and after the row + orjson fast path.
+
+Usage: `python -m benchmarks.serialization [--students N] [--scores-per-student N] [--page-size N] [--iterations N]`
+
+"before" is the previous implementation of each endpoint: ORM objects (with `selectinload` for the
+student scores), Pydantic `from_attributes` validation and the standard library JSON encoder. "after" calls
+the endpoint function itself. Both run in-process against a throwaway database seeded like `benchmarks.run`.
+"""
+import argparse
+import sys
+import time
+from typing import Awaitable, Callable
+
+import orjson
+
+from .run import add_database_arguments, run_in_throwaway_database, seed_database
+
+
+async def _benchmark(args: argparse.Namespace) -> dict:
+    from fastapi.responses import JSONResponse
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    from src.database import async_session_maker, close_database, open_database
+    from src.scores.models import Score as ScoreModel
+    from src.scores.router import list_scores
+    from src.scores.schemas import ScorePage
+    from src.students.models import Student as StudentModel
+    from src.students.router import list_students
+    from src.students.schemas import StudentPage
+
+    async def students_before(session):
+        stmt = (
+            select(StudentModel)
+            .options(selectinload(StudentModel.scores))
+            .order_by(StudentModel.id)
+            .limit(args.page_size)
+        )
+        students = (await session.execute(stmt)).scalars().all()
+        page = StudentPage.model_validate({"items": students}, from_attributes=True)
+        return JSONResponse(page.model_dump(mode="json")).body
+
+    async def students_after(session):
+        return (await list_students(limit=args.page_size, cursor=None, session=session)).body
+
+    async def scores_before(session):
+        stmt = select(ScoreModel).order_by(ScoreModel.id).limit(args.page_size)
+        scores = (await session.execute(stmt)).scalars().all()
+        page = ScorePage.model_validate({"items": scores}, from_attributes=True)
+        return JSONResponse(page.model_dump(mode="json")).body
+
+    async def scores_after(session):
+        response = await list_scores(
+            student_id=None, since=None, until=None, limit=args.page_size, cursor=None, session=session
+        )
+        return response.body
+
+    async def cpu_ms_per_response(render: Callable[..., Awaitable[bytes]]) -> float:
+        # A new session per response, so the ORM identity map never saves the "before" path any work.
+        started = time.process_time()
+        for _ in range(args.iterations):
+            async with async_session_maker() as session:
+                await render(session)
+        return round(1000 * (time.process_time() - started) / args.iterations, 3)
+
+    await open_database()
+    results = {}
+    try:
+        await seed_database(args.students, args.scores_per_student, args.seed)
+        for name, before, after in (
+            ("GET /student/", students_before, students_after),
+            ("GET /score/", scores_before, scores_after),
+        ):
+            async with async_session_maker() as session:
+                if _items(await before(session)) != _items(await after(session)):
+                    print(f"{name}: the responses of both paths differ", file=sys.stderr)
+            before_ms = await cpu_ms_per_response(before)
+            after_ms = await cpu_ms_per_response(after)
+            results[name] = {
+                "before_cpu_ms": before_ms,
+                "after_cpu_ms": after_ms,
+                "speedup": round(before_ms / after_ms, 2) if after_ms else None,
+            }
+    finally:
+        await close_database()
+    return results
+
+
+def _items(body: bytes) -> list:
+    # The old path did not look ahead for a next page or order the scores of a student.
+    items = orjson.loads(body)["items"]
+    for item in items:
+        if "scores" in item:
+            item["scores"].sort(key=lambda score: score["id"])
+    return items
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.serialization", description=__doc__.strip().splitlines()[0]
+    )
+    add_database_arguments(parser)
+    parser.add_argument("--page-size", type=int, default=50, help="Items per response.")
+    parser.add_argument("--iterations", type=int, default=200, help="Responses rendered per path.")
+    args = parser.parse_args()
+
+    results = run_in_throwaway_database(args, _benchmark)
+    sys.stdout.buffer.write(orjson.dumps(results, option=orjson.OPT_INDENT_2) + b"\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Add students trigram indexes
+
+Revision ID: 3a065a6291ef
+Revises: fbe3dee56967
+Create Date: 2026-10-18 19:02:44.318206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a065a6291ef'
+down_revision: Union[str, None] = 'fbe3dee56967'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = ('first_name', 'last_name', 'email')
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # Built concurrently so that a large students table stays writable while the indexes are created.
+    with op.get_context().autocommit_block():
+        for column in COLUMNS:
+            op.create_index(
+                f'ix_students_{column}_trgm', 'students', [column],
+                unique=False, postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'},
+                postgresql_concurrently=True
+            )
+
+
+def downgrade() -> None:
+    # The pg_trgm extension is left installed, as other objects may depend on it.
+    with op.get_context().autocommit_block():
+        for column in COLUMNS:
+            op.drop_index(f'ix_students_{column}_trgm', table_name='students', postgresql_concurrently=True)
@@ -0,0 +1,118 @@
+"""Partition scores by term
+
+Revision ID: 6cf9b0f6ff4f
+Revises: 3a065a6291ef
+Create Date: 2026-10-18 19:58:12.640183
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6cf9b0f6ff4f'
+down_revision: Union[str, None] = '3a065a6291ef'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = 'id, score, created_at, updated_at, student_id'
+
+# The partitioning of this revision, kept here rather than read from the app so that the migration does not change
+# with it: six month terms starting in January, and partitions up to two terms ahead.
+TERM_MONTHS = 6
+PARTITIONS_AHEAD = 2
+DEFAULT_PARTITION = 'scores_default'
+
+
+def term_start(moment: datetime) -> datetime:
+    return datetime(moment.year, (moment.month - 1) // TERM_MONTHS * TERM_MONTHS + 1, 1)
+
+
+def next_term(start: datetime) -> datetime:
+    month = start.month - 1 + TERM_MONTHS
+    return datetime(start.year + month // 12, month % 12 + 1, 1)
+
+
+def create_partition_sql(start: datetime) -> str:
+    return (
+        f'CREATE TABLE IF NOT EXISTS "scores_{start:%Y_%m}" PARTITION OF scores '
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{next_term(start).isoformat()}')"
+    )
+
+
+def upgrade() -> None:
+    # A table cannot be partitioned in place: the rows are copied into a new partitioned table, which blocks
+    # score writes for the duration of the migration.
+    op.execute('LOCK TABLE scores IN SHARE MODE')
+    op.rename_table('scores', 'scores_unpartitioned')
+    op.execute('ALTER INDEX scores_pkey RENAME TO scores_unpartitioned_pkey')
+    op.execute('ALTER INDEX ix_scores_id RENAME TO ix_scores_unpartitioned_id')
+    op.execute('ALTER INDEX ix_scores_student_id_created_at RENAME TO ix_scores_unpartitioned_student_id_created_at')
+    op.execute(
+        'ALTER TABLE scores_unpartitioned '
+        'RENAME CONSTRAINT scores_student_id_fkey TO scores_unpartitioned_student_id_fkey'
+    )
+
+    op.create_table('scores',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('scores_id_seq'::regclass)"), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=True),
+    sa.Column('student_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id']),
+    # The partition key has to be part of the primary key, so `id` alone is no longer enforced unique: it stays
+    # unique as long as ids come from `scores_id_seq` only.
+    sa.PrimaryKeyConstraint('id', 'created_at'),
+    postgresql_partition_by='RANGE (created_at)'
+    )
+
+    # A partition for every term from the oldest score to PARTITIONS_AHEAD terms from now.
+    oldest = op.get_bind().execute(sa.text('SELECT min(created_at) FROM scores_unpartitioned')).scalar()
+    start = term_start(datetime.now(timezone.utc).replace(tzinfo=None))
+    last = start
+    for _ in range(PARTITIONS_AHEAD):
+        last = next_term(last)
+    if oldest is not None:
+        start = min(start, term_start(oldest))
+    while start <= last:
+        op.execute(create_partition_sql(start))
+        start = next_term(start)
+    op.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF scores DEFAULT')
+
+    # The partition key cannot be NULL; such scores are dated to the migration.
+    op.execute(f"""
+        INSERT INTO scores ({COLUMNS})
+        SELECT id, score, coalesce(created_at, now()), updated_at, student_id FROM scores_unpartitioned
+    """)
+    op.execute('ALTER SEQUENCE scores_id_seq OWNED BY scores.id')
+    op.drop_table('scores_unpartitioned')
+
+    op.create_index('ix_scores_id', 'scores', ['id'], unique=False)
+    op.create_index('ix_scores_student_id_created_at', 'scores', ['student_id', 'created_at'], unique=False)
+    op.execute('ANALYZE scores')
+
+
+def downgrade() -> None:
+    # Scores of archived terms are not brought back.
+    op.execute('LOCK TABLE scores IN SHARE MODE')
+    op.create_table('scores_unpartitioned',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('scores_id_seq'::regclass)"), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=True),
+    sa.Column('student_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], name='scores_unpartitioned_student_id_fkey'),
+    sa.PrimaryKeyConstraint('id', name='scores_unpartitioned_pkey')
+    )
+    op.execute(f'INSERT INTO scores_unpartitioned ({COLUMNS}) SELECT {COLUMNS} FROM scores')
+    op.execute('ALTER SEQUENCE scores_id_seq OWNED BY scores_unpartitioned.id')
+    op.drop_table('scores')
+
+    op.rename_table('scores_unpartitioned', 'scores')
+    op.execute('ALTER INDEX scores_unpartitioned_pkey RENAME TO scores_pkey')
+    op.execute('ALTER TABLE scores RENAME CONSTRAINT scores_unpartitioned_student_id_fkey TO scores_student_id_fkey')
+    op.create_index('ix_scores_id', 'scores', ['id'], unique=False)
+    op.create_index('ix_scores_student_id_created_at', 'scores', ['student_id', 'created_at'], unique=False)
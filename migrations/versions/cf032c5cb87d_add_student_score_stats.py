@@ -0,0 +1,51 @@
+"""Add student score stats
+
+Revision ID: cf032c5cb87d
+Revises: 68f36ceeaaf9
+Create Date: 2026-10-18 18:20:41.512304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cf032c5cb87d'
+down_revision: Union[str, None] = '68f36ceeaaf9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('student_score_stats',
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('score_count', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.BigInteger(), nullable=False),
+    sa.Column('score_sum_squares', sa.BigInteger(), nullable=False),
+    sa.Column('min_score', sa.Integer(), nullable=True),
+    sa.Column('max_score', sa.Integer(), nullable=True),
+    sa.Column('latest_score_id', sa.Integer(), nullable=True),
+    sa.Column('latest_score', sa.Integer(), nullable=True),
+    sa.Column('last_updated', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('student_id')
+    )
+    # Backfill the summaries of the scores that already exist.
+    op.execute("""
+        INSERT INTO student_score_stats (
+            student_id, score_count, score_sum, score_sum_squares,
+            min_score, max_score, latest_score_id, latest_score
+        )
+        SELECT student_id, count(score), sum(score), sum(score::bigint * score),
+               min(score), max(score),
+               (array_agg(id ORDER BY id DESC))[1], (array_agg(score ORDER BY id DESC))[1]
+        FROM scores
+        WHERE student_id IS NOT NULL AND score IS NOT NULL
+        GROUP BY student_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('student_score_stats')
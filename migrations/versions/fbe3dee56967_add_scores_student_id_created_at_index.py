@@ -0,0 +1,32 @@
+"""Add scores student_id created_at index
+
+Revision ID: fbe3dee56967
+Revises: cf032c5cb87d
+Create Date: 2026-10-18 18:41:07.183520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fbe3dee56967'
+down_revision: Union[str, None] = 'cf032c5cb87d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently so that a large scores table stays writable while the index is created.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_scores_student_id_created_at', 'scores', ['student_id', 'created_at'],
+            unique=False, postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_scores_student_id_created_at', table_name='scores', postgresql_concurrently=True)
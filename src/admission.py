@@ -0,0 +1,125 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict
+
+from fastapi import Request
+from fastapi.responses import ORJSONResponse
+
+from .config import (
+    ADMISSION_ENABLED, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT, ADMISSION_READ_LIMIT, ADMISSION_RETRY_AFTER,
+    ADMISSION_WRITE_LIMIT,
+)
+
+
+class Overloaded(Exception):
+    """Raised when a request is not admitted; answered with 503 and `Retry-After`."""
+
+    def __init__(self, gate: str):
+        super().__init__(f"Too many concurrent {gate} requests")
+        self.gate = gate
+
+
+class AdmissionGate:
+    """
+    Lets at most `limit` requests in at once and up to `queue_size` more wait, in order, for a free slot.
+
+    A request that finds the queue full is rejected at once; one that waits longer than `queue_timeout`
+    seconds is rejected too. Failing fast keeps the latency of the admitted requests bounded under overload,
+    instead of every request queueing for a database connection until the pool times out.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout: float, enabled: bool = True):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.enabled = enabled
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        if not self.enabled:
+            yield
+            return
+
+        await self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    def check(self) -> None:
+        """Reject right away if a request would be rejected anyway, without taking a slot."""
+        if self.enabled and self.active >= self.limit and len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            raise Overloaded(self.name)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+    async def _acquire(self) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            raise Overloaded(self.name)
+
+        # A released slot is handed over to the first waiter, which is why `active` is not incremented here.
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            self._abandon(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.rejected += 1
+            raise Overloaded(self.name)
+        self.admitted += 1
+
+    def _release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # The slot was handed over just as the wait ended: pass it on.
+            self._release()
+            return
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+
+read_gate = AdmissionGate(
+    "read", ADMISSION_READ_LIMIT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT, ADMISSION_ENABLED
+)
+write_gate = AdmissionGate(
+    "write", ADMISSION_WRITE_LIMIT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT, ADMISSION_ENABLED
+)
+
+
+async def overloaded_handler(request: Request, exc: Overloaded) -> ORJSONResponse:
+    return ORJSONResponse(
+        {"detail": f"{exc}, please retry later."},
+        status_code=503,
+        headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+    )
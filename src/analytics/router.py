@@ -0,0 +1,83 @@
+from typing import List, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from .schemas import Distribution, StudentRank
+from .service import analytics
+from ..database import get_read_session
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["Analytics"]
+)
+
+
+@router.get("/distribution", response_model=Distribution)
+async def get_distribution(
+        bins: int = Query(10, ge=1, le=1000),
+        q: List[float] = Query([10, 25, 50, 75, 90, 99]),
+        session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Read the distribution of all scores.
+
+    Scores are loaded in bulk into NumPy arrays and the result is cached until a score changes.
+
+    Parameters:
+    - `bins` (int): The number of equal-width histogram bins.
+    - `q` (List[float]): The percentiles to compute, between 0 and 100.
+    - `session` (AsyncSession): A database session.
+
+    Returns:
+    - `Distribution`: Count, mean, standard deviation, min, max, the requested percentiles and a histogram.
+
+    Raises:
+    - `HTTPException` 400: If a percentile is outside of [0, 100].
+    - `HTTPException` 500: If there is an internal server error.
+    """
+    if any(not 0 <= value <= 100 for value in q):
+        raise HTTPException(status_code=400, detail="Percentiles must be between 0 and 100.")
+
+    try:
+        snapshot = await analytics.snapshot(session)
+        return await run_in_threadpool(snapshot.distribution, bins, sorted(set(q)))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/rank/{student_id}", response_model=StudentRank)
+async def get_student_rank(
+        student_id: int,
+        metric: Literal["avg", "total"] = "avg",
+        session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Read the rank of a student among all students with scores.
+
+    Parameters:
+    - `student_id` (int): The ID of the student.
+    - `metric` (str): Rank by average (`avg`) or total (`total`) score.
+    - `session` (AsyncSession): A database session.
+
+    Returns:
+    - `StudentRank`: The student's value, rank (1 is best, ties share a rank) and percentile.
+
+    Raises:
+    - `HTTPException` 404: If the student has no scores.
+    - `HTTPException` 500: If there is an internal server error.
+    """
+    try:
+        snapshot = await analytics.snapshot(session)
+        rank = snapshot.rank(student_id, metric)
+
+        if rank is None:
+            raise NoResultFound
+
+        return rank
+    except NoResultFound:
+        raise HTTPException(status_code=404, detail="Student has no scores")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,26 @@
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+
+class Histogram(BaseModel):
+    edges: List[float]
+    counts: List[int]
+
+
+class Distribution(BaseModel):
+    count: int
+    mean: Optional[float] = None
+    stddev: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    percentiles: Dict[str, float] = {}
+    histogram: Histogram
+
+
+class StudentRank(BaseModel):
+    student_id: int
+    metric: str
+    value: float
+    rank: int
+    total_students: int
+    percentile: float
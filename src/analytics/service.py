@@ -0,0 +1,154 @@
+import asyncio
+import time
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from ..config import ANALYTICS_CACHE_TTL, ANALYTICS_FETCH_SIZE, ANALYTICS_REFRESH_INTERVAL
+from ..scores.models import Score as ScoreModel
+from ..scores.signals import ScoreChange, on_score_change
+
+# Distinct distribution requests memoized per snapshot; the parameters come from the query string.
+MAX_MEMOIZED_RESULTS = 64
+
+
+class ScoreSnapshot:
+    """
+    Every `(student_id, score)` pair as NumPy arrays, plus per-student aggregates derived from them.
+
+    A snapshot is immutable once built; the `MAX_MEMOIZED_RESULTS` latest results computed from it are memoized
+    on the instance.
+    """
+
+    def __init__(self, student_ids: np.ndarray, scores: np.ndarray):
+        self.scores = scores
+        self.students, inverse = np.unique(student_ids, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(self.students))
+        totals = np.bincount(inverse, weights=scores, minlength=len(self.students))
+        self.metrics = {
+            "total": totals,
+            "avg": np.divide(totals, counts, out=np.zeros_like(totals), where=counts > 0),
+        }
+        self.sorted_metrics = {name: np.sort(values) for name, values in self.metrics.items()}
+        self._results: Dict[tuple, dict] = {}
+
+    def distribution(self, bins: int, quantiles: Sequence[float]) -> dict:
+        key = ("distribution", bins, tuple(quantiles))
+        result = self._results.get(key)
+        if result is not None:
+            return result
+
+        if not len(self.scores):
+            result = {"count": 0, "histogram": {"edges": [], "counts": []}}
+        else:
+            counts, edges = np.histogram(self.scores, bins=bins)
+            values = np.percentile(self.scores, quantiles) if len(quantiles) else []
+            result = {
+                "count": int(len(self.scores)),
+                "mean": float(self.scores.mean()),
+                "stddev": float(self.scores.std()),
+                "min": float(self.scores.min()),
+                "max": float(self.scores.max()),
+                "percentiles": {f"p{q:g}": float(value) for q, value in zip(quantiles, values)},
+                "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+            }
+        self._results[key] = result
+        while len(self._results) > MAX_MEMOIZED_RESULTS:
+            del self._results[next(iter(self._results))]
+        return result
+
+    def rank(self, student_id: int, metric: str) -> Optional[dict]:
+        position = int(np.searchsorted(self.students, student_id))
+        if position >= len(self.students) or self.students[position] != student_id:
+            return None
+
+        value = self.metrics[metric][position]
+        ordered = self.sorted_metrics[metric]
+        total = len(ordered)
+        below = int(np.searchsorted(ordered, value, side="left"))
+        above = total - int(np.searchsorted(ordered, value, side="right"))
+        return {
+            "student_id": student_id,
+            "metric": metric,
+            "value": float(value),
+            "rank": above + 1,
+            "total_students": total,
+            "percentile": 100.0 * below / total,
+        }
+
+
+class ScoreAnalytics:
+    """
+    Lazily loads a `ScoreSnapshot` and reloads it once it is `ttl` seconds old or, after a score changed, at most
+    every `refresh_interval` seconds, so that a steady stream of writes does not turn every read into a reload.
+
+    While a snapshot is reloaded, concurrent requests are served the previous one. The TTL bounds how long changes
+    made by other worker processes can go unnoticed.
+    """
+
+    def __init__(self, ttl: float, refresh_interval: float):
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self._snapshot: Optional[ScoreSnapshot] = None
+        self._loaded_at = 0.0
+        self._stale = False
+        self._lock = asyncio.Lock()
+
+    def invalidate(self, changes: Sequence[ScoreChange] = ()) -> None:
+        self._stale = True
+
+    async def snapshot(self, session: AsyncSession) -> ScoreSnapshot:
+        if self._snapshot is not None and (self._fresh() or self._lock.locked()):
+            return self._snapshot
+
+        async with self._lock:
+            if self._snapshot is not None and self._fresh():
+                return self._snapshot
+
+            # Changes made from now on may be missing from the new snapshot: they mark it stale again.
+            self._stale = False
+            try:
+                snapshot = await self._load(session)
+            except BaseException:
+                self._stale = True
+                raise
+            self._snapshot, self._loaded_at = snapshot, time.monotonic()
+            return snapshot
+
+    def _fresh(self) -> bool:
+        age = time.monotonic() - self._loaded_at
+        return age <= self.ttl and (not self._stale or age < self.refresh_interval)
+
+    async def _load(self, session: AsyncSession) -> ScoreSnapshot:
+        # Each page of rows comes back as two Postgres arrays, which asyncpg decodes far faster than
+        # row objects. Pages are walked by id so memory per round-trip stays bounded.
+        student_ids, scores = [], []
+        after_id = 0
+        while True:
+            page = (
+                select(ScoreModel.id, ScoreModel.student_id, ScoreModel.score)
+                .where(ScoreModel.id > after_id, ScoreModel.student_id.is_not(None), ScoreModel.score.is_not(None))
+                .order_by(ScoreModel.id)
+                .limit(ANALYTICS_FETCH_SIZE)
+                .subquery()
+            )
+            result = await session.execute(
+                select(func.array_agg(page.c.student_id), func.array_agg(page.c.score), func.max(page.c.id))
+            )
+            page_student_ids, page_scores, last_id = result.one()
+            if last_id is None:
+                break
+            student_ids.append(np.array(page_student_ids, dtype=np.int64))
+            scores.append(np.array(page_scores, dtype=np.float64))
+            after_id = last_id
+
+        if not student_ids:
+            return ScoreSnapshot(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        return await run_in_threadpool(ScoreSnapshot, np.concatenate(student_ids), np.concatenate(scores))
+
+
+analytics = ScoreAnalytics(ANALYTICS_CACHE_TTL, ANALYTICS_REFRESH_INTERVAL)
+on_score_change(analytics.invalidate)
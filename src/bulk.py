@@ -0,0 +1,139 @@
+import codecs
+import csv
+from collections import deque
+from typing import Any, AsyncIterator, Deque, List, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+
+
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+CSV_CONTENT_TYPES = {"text/csv", "application/csv"}
+
+# (row index, parsed payload, parse error)
+Record = Tuple[int, Any, Optional[str]]
+
+
+async def iter_record_batches(request: Request, batch_size: int) -> AsyncIterator[List[Record]]:
+    """
+    Read a bulk request body and yield its records in batches.
+
+    The format is picked from the `Content-Type` header: NDJSON and CSV bodies are parsed
+    incrementally as they are streamed in, anything else is treated as a JSON array.
+    Rows that cannot be parsed are yielded with an error instead of aborting the upload.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_CONTENT_TYPES:
+        records = _iter_ndjson(request)
+    elif content_type in CSV_CONTENT_TYPES:
+        records = _iter_csv(request)
+    else:
+        records = _iter_json_array(request)
+
+    batch: List[Record] = []
+    async for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def format_validation_error(exc: ValidationError) -> str:
+    """Render a pydantic validation error as a short one-line message."""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in exc.errors()
+    )
+
+
+async def _iter_lines(request: Request, keepends: bool = False) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line + "\n" if keepends else line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer if keepends else buffer.rstrip("\r")
+
+
+async def _iter_ndjson(request: Request) -> AsyncIterator[Record]:
+    index = 0
+    async for line in _iter_lines(request):
+        if not line.strip():
+            continue
+        try:
+            yield index, orjson.loads(line), None
+        except orjson.JSONDecodeError:
+            yield index, None, "Invalid JSON"
+        index += 1
+
+
+class _LineFeed:
+    """
+    The input of a `csv.reader` that is filled as the body streams in.
+
+    The reader stops when the feed runs dry and resumes once it is refilled, so the feed must only be given
+    complete records: a quoted field may span several lines.
+    """
+
+    def __init__(self):
+        self.lines: Deque[str] = deque()
+
+    def __iter__(self) -> "_LineFeed":
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def _iter_csv_rows(request: Request) -> AsyncIterator[List[str]]:
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    quotes = 0
+    async for line in _iter_lines(request, keepends=True):
+        feed.lines.append(line)
+        # Quotes are escaped by doubling them, so a record is complete once its quotes are balanced.
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            quotes = 0
+            for values in reader:
+                yield values
+    # An unterminated quoted field: the reader takes the rest of the body as its value.
+    for values in reader:
+        yield values
+
+
+async def _iter_csv(request: Request) -> AsyncIterator[Record]:
+    header = None
+    index = 0
+    async for values in _iter_csv_rows(request):
+        if not values or (len(values) == 1 and not values[0].strip()):
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield index, None, f"Expected {len(header)} columns, got {len(values)}"
+        else:
+            yield index, {key: value or None for key, value in zip(header, values)}, None
+        index += 1
+
+
+async def _iter_json_array(request: Request) -> AsyncIterator[Record]:
+    try:
+        payload = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Request body is not valid JSON.")
+
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="Request body must be a JSON array.")
+
+    for index, item in enumerate(payload):
+        yield index, item, None
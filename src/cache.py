@@ -0,0 +1,214 @@
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import CACHE_CHANNEL, CACHE_MAX_ENTRIES, CACHE_TTL, FEED_CHANNEL
+from .feed.hub import listener, notify
+from .scores.signals import ScoreChange, on_score_change
+
+
+class CacheBackend:
+    """
+    Storage interface of the read-through cache.
+
+    Values are JSON-compatible dicts, so an external cache (Redis, Memcached, ...) can be plugged in
+    with `cache.use_backend()` by implementing these four methods.
+    """
+
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any) -> None:
+        raise NotImplementedError
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        raise NotImplementedError
+
+    async def clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """A bounded in-process cache with least-recently-used eviction and a time-to-live per entry."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+
+class ReadThroughCache:
+    """
+    Read-through cache with hit/miss counters and write invalidation.
+
+    A value loaded from the database is only stored if its key was not invalidated while it was being
+    loaded, so a read racing with a write can never put the pre-write value back into the cache. Values
+    read from a lagging replica are also not stored if the key was invalidated within the replica lag.
+    """
+
+    def __init__(self, backend: CacheBackend, max_tombstones: int):
+        self.backend = backend
+        self.max_tombstones = max_tombstones
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._epoch = 0
+        self._tombstones: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._tombstone_floor = (0, float("-inf"))
+
+    def use_backend(self, backend: CacheBackend) -> None:
+        self.backend = backend
+
+    async def get_or_load(
+            self,
+            key: str,
+            loader: Callable[[], Awaitable[Optional[Any]]],
+            lag: float = 0.0
+    ) -> Optional[Any]:
+        """
+        Return the cached value of `key`, or load, store and return it. `None` results are not cached.
+
+        `lag` is how many seconds the data source of `loader` may be behind the primary database.
+        """
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        token = self._epoch
+        value = await loader()
+        if value is not None and not self._invalidated_since(key, token, lag):
+            await self.backend.set(key, value)
+        return value
+
+    async def peek(self, key: str) -> Optional[Any]:
+        """Return the cached value of `key`, or `None` without loading it."""
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    async def invalidate(self, keys: Iterable[str]) -> None:
+        keys = set(keys)
+        now = time.monotonic()
+        for key in keys:
+            self._epoch += 1
+            self._tombstones[key] = (self._epoch, now)
+            self._tombstones.move_to_end(key)
+        while len(self._tombstones) > self.max_tombstones:
+            _, tombstone = self._tombstones.popitem(last=False)
+            self._tombstone_floor = max(self._tombstone_floor, tombstone)
+
+        self.invalidations += len(keys)
+        await self.backend.delete(keys)
+
+    async def clear(self) -> None:
+        """Invalidate every key, e.g. after invalidations may have been missed."""
+        self._epoch += 1
+        self._tombstones.clear()
+        self._tombstone_floor = (self._epoch, time.monotonic())
+        await self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+        if isinstance(self.backend, MemoryCacheBackend):
+            stats["entries"] = len(self.backend)
+            stats["evictions"] = self.backend.evictions
+        return stats
+
+    def _invalidated_since(self, key: str, token: int, lag: float) -> bool:
+        # The key's tombstone may have been dropped already; then only trust its absence if nothing newer was.
+        epoch, invalidated_at = self._tombstones.get(key, self._tombstone_floor)
+        return epoch > token or time.monotonic() - invalidated_at < lag
+
+
+def student_key(student_id: int) -> str:
+    return f"student:{student_id}"
+
+
+def score_key(score_id: int) -> str:
+    return f"score:{score_id}"
+
+
+cache = ReadThroughCache(MemoryCacheBackend(CACHE_MAX_ENTRIES, CACHE_TTL), max_tombstones=CACHE_MAX_ENTRIES)
+
+
+async def notify_invalidation(session: AsyncSession, keys: Iterable[str]) -> None:
+    """
+    Invalidate `keys` in the caches of the other workers too, once the session's transaction commits.
+
+    Call this before committing. Keys of changed scores and of their students do not need it: every worker
+    invalidates them when it is notified of the score changes.
+    """
+    await notify(session, CACHE_CHANNEL, sorted(set(keys)))
+
+
+def _score_change_keys(changes: Iterable[ScoreChange]) -> Set[str]:
+    keys = set()
+    for change in changes:
+        keys.add(score_key(change.score_id))
+        for student_id in (change.student_id, change.old_student_id):
+            if student_id is not None:
+                keys.add(student_key(student_id))
+    return keys
+
+
+@on_score_change
+async def _invalidate_scores(changes: Sequence[ScoreChange]) -> None:
+    await cache.invalidate(_score_change_keys(changes))
+
+
+if listener is not None:
+    # The changes committed by other workers. The worker's own changes come back as well, which is harmless.
+    async def _invalidate_notified_scores(events: List[dict]) -> None:
+        await cache.invalidate(_score_change_keys(ScoreChange(**event) for event in events))
+
+    async def _invalidate_notified_keys(keys: List[str]) -> None:
+        await cache.invalidate(keys)
+
+    listener.listen(FEED_CHANNEL, _invalidate_notified_scores)
+    listener.listen(CACHE_CHANNEL, _invalidate_notified_keys)
+    listener.on_reconnect(cache.clear)
@@ -0,0 +1,73 @@
+"""
+Conditional GET support: strong `ETag` and `Last-Modified` validators, and `304 Not Modified` responses.
+
+Validators are computed from version columns only, so a handler can answer a conditional request after a cheap
+version lookup, without loading or serializing the representation.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi import Request, Response
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def make_etag(*version: Any) -> str:
+    """Build a strong entity tag from the values that identify a version of a representation."""
+    digest = hashlib.blake2b(orjson.dumps(version, default=str), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def epoch_microseconds(moment: datetime) -> int:
+    """Microseconds since the epoch of a naive UTC timestamp, exactly as Postgres computes them."""
+    return (moment - _EPOCH) // timedelta(microseconds=1)
+
+
+def parse_timestamp(value: Optional[Any]) -> Optional[datetime]:
+    """Read back a timestamp of a cached (JSON-compatible) row."""
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    Whether the client's copy is current, per the `If-None-Match` and `If-Modified-Since` request headers.
+
+    `If-Modified-Since` is only evaluated without `If-None-Match`, and only to the second, like HTTP dates.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # GET compares entity tags weakly: a `W/` prefix added by a proxy does not matter.
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def not_modified(etag: str, last_modified: Optional[datetime]) -> Response:
+    return Response(status_code=304, headers=validator_headers(etag, last_modified))
@@ -1,12 +1,106 @@
-from starlette.config import Config
+from starlette.config import Config, undefined
+from starlette.datastructures import CommaSeparatedStrings
 
 
 env = Config(".env")
 
 SECRET_KEY = env("SECRET_KEY", cast=str)
 
-DB_USER = env("DB_USER", cast=str)
-DB_PASSWORD = env("DB_PASSWORD", cast=str)
+# A full SQLAlchemy URL, e.g. of a test database. When set, the DB_* connection details are not needed.
+DATABASE_URL = env("DATABASE_URL", cast=str, default="")
+_db_default = "" if DATABASE_URL else undefined
+
+DB_USER = env("DB_USER", cast=str, default=_db_default)
+DB_PASSWORD = env("DB_PASSWORD", cast=str, default=_db_default)
 DB_HOST = env("DB_HOST", cast=str, default="db")
 DB_PORT = env("DB_PORT", cast=str, default="5432")
-DB_NAME = env("DB_NAME", cast=str)
+DB_NAME = env("DB_NAME", cast=str, default=_db_default)
+
+DB_POOL_SIZE = env("DB_POOL_SIZE", cast=int, default=5)
+DB_MAX_OVERFLOW = env("DB_MAX_OVERFLOW", cast=int, default=10)
+DB_POOL_TIMEOUT = env("DB_POOL_TIMEOUT", cast=float, default=30.0)
+DB_POOL_RECYCLE = env("DB_POOL_RECYCLE", cast=int, default=-1)
+DB_POOL_PRE_PING = env("DB_POOL_PRE_PING", cast=bool, default=False)
+DB_STATEMENT_CACHE_SIZE = env("DB_STATEMENT_CACHE_SIZE", cast=int, default=100)
+# Connections opened at startup, before the first request, with the hot statements prepared on each (0 disables).
+DB_POOL_WARM_UP = env("DB_POOL_WARM_UP", cast=int, default=DB_POOL_SIZE)
+# Set when connecting through PgBouncer in transaction pooling mode: disables prepared statement caching.
+DB_PGBOUNCER = env("DB_PGBOUNCER", cast=bool, default=False)
+
+# Full SQLAlchemy URLs of read replicas, comma separated. GET endpoints read from them when set.
+DB_REPLICA_URLS = env("DB_REPLICA_URLS", cast=CommaSeparatedStrings, default="")
+DB_REPLICA_STRATEGY = env("DB_REPLICA_STRATEGY", cast=str, default="round_robin")
+DB_REPLICA_RETRY_AFTER = env("DB_REPLICA_RETRY_AFTER", cast=float, default=30.0)
+# How far replicas may lag behind: clients read from the primary for this long after a write.
+DB_REPLICA_MAX_LAG = env("DB_REPLICA_MAX_LAG", cast=float, default=5.0)
+
+# Admission control: how many requests per worker may use the database at once, and how many more may wait for
+# their turn (at most ADMISSION_QUEUE_TIMEOUT seconds) before requests are rejected with 503. By default the
+# read and write budgets split the pool between them, so admitted requests never wait for a connection.
+_DB_CAPACITY = DB_POOL_SIZE + max(DB_MAX_OVERFLOW, 0)
+ADMISSION_ENABLED = env("ADMISSION_ENABLED", cast=bool, default=True)
+ADMISSION_WRITE_LIMIT = env("ADMISSION_WRITE_LIMIT", cast=int, default=max(1, _DB_CAPACITY // 3))
+ADMISSION_READ_LIMIT = env("ADMISSION_READ_LIMIT", cast=int, default=max(1, _DB_CAPACITY - ADMISSION_WRITE_LIMIT))
+ADMISSION_QUEUE_SIZE = env("ADMISSION_QUEUE_SIZE", cast=int, default=2 * _DB_CAPACITY)
+ADMISSION_QUEUE_TIMEOUT = env("ADMISSION_QUEUE_TIMEOUT", cast=float, default=1.0)
+ADMISSION_RETRY_AFTER = env("ADMISSION_RETRY_AFTER", cast=int, default=1)
+
+BULK_BATCH_SIZE = env("BULK_BATCH_SIZE", cast=int, default=1000)
+
+PAGE_SIZE_DEFAULT = env("PAGE_SIZE_DEFAULT", cast=int, default=50)
+PAGE_SIZE_MAX = env("PAGE_SIZE_MAX", cast=int, default=500)
+# Students per field that `GET /student/search` ranks at most, so broad fragments such as "gmail" do not rank the
+# whole table.
+SEARCH_CANDIDATES = env("SEARCH_CANDIDATES", cast=int, default=200)
+
+ANALYTICS_FETCH_SIZE = env("ANALYTICS_FETCH_SIZE", cast=int, default=500_000)
+ANALYTICS_CACHE_TTL = env("ANALYTICS_CACHE_TTL", cast=float, default=60.0)
+# After score changes, the analytics snapshot is reloaded at most this often.
+ANALYTICS_REFRESH_INTERVAL = env("ANALYTICS_REFRESH_INTERVAL", cast=float, default=5.0)
+
+# Seconds between the checks of the in-memory leaderboard against the database (0 disables them), and the
+# largest board that can be requested.
+LEADERBOARD_CHECK_INTERVAL = env("LEADERBOARD_CHECK_INTERVAL", cast=float, default=60.0)
+LEADERBOARD_MAX_N = env("LEADERBOARD_MAX_N", cast=int, default=100)
+
+# Coalesce concurrent `POST /score/` requests into one INSERT and commit per batch. A batch is written when
+# it has SCORE_BATCH_MAX_SIZE scores or its first score has waited SCORE_BATCH_MAX_WAIT seconds.
+SCORE_BATCH_ENABLED = env("SCORE_BATCH_ENABLED", cast=bool, default=False)
+SCORE_BATCH_MAX_WAIT = env("SCORE_BATCH_MAX_WAIT", cast=float, default=0.005)
+SCORE_BATCH_MAX_SIZE = env("SCORE_BATCH_MAX_SIZE", cast=int, default=500)
+
+# `scores` is range partitioned on created_at, one partition per term of SCORE_TERM_MONTHS months (a divisor of 12,
+# terms start in January). The partitions of the current and the next SCORE_PARTITIONS_AHEAD terms are created at
+# startup and every SCORE_PARTITION_CHECK_INTERVAL seconds; 0 leaves it to `python -m src.manage create-partitions`.
+SCORE_TERM_MONTHS = env("SCORE_TERM_MONTHS", cast=int, default=6)
+SCORE_PARTITIONS_AHEAD = env("SCORE_PARTITIONS_AHEAD", cast=int, default=2)
+SCORE_PARTITION_CHECK_INTERVAL = env("SCORE_PARTITION_CHECK_INTERVAL", cast=float, default=3600.0)
+
+# Live score change feed. FEED_BROKER "postgres" sends changes with NOTIFY on FEED_CHANNEL and each worker LISTENs
+# on one dedicated connection (not through PgBouncer in transaction mode); "local" only delivers the changes made
+# by the same process. A subscriber further than FEED_QUEUE_SIZE events behind is disconnected.
+FEED_BROKER = env("FEED_BROKER", cast=str, default="postgres")
+FEED_CHANNEL = env("FEED_CHANNEL", cast=str, default="score_changes")
+FEED_QUEUE_SIZE = env("FEED_QUEUE_SIZE", cast=int, default=BULK_BATCH_SIZE)
+FEED_MAX_SUBSCRIBERS = env("FEED_MAX_SUBSCRIBERS", cast=int, default=1000)
+FEED_HEARTBEAT = env("FEED_HEARTBEAT", cast=float, default=15.0)
+FEED_RECONNECT_DELAY = env("FEED_RECONNECT_DELAY", cast=float, default=1.0)
+
+# Report card jobs run on REPORT_WORKERS processes per app worker (0 leaves the queued jobs to other workers),
+# REPORT_CHUNK_SIZE students at a time. A running job without a heartbeat (sent every third of REPORT_JOB_TIMEOUT)
+# for REPORT_JOB_TIMEOUT seconds, e.g. after a crash, is run again, at most REPORT_MAX_ATTEMPTS times in all.
+REPORT_WORKERS = env("REPORT_WORKERS", cast=int, default=1)
+REPORT_CHUNK_SIZE = env("REPORT_CHUNK_SIZE", cast=int, default=500)
+REPORT_MAX_STUDENTS = env("REPORT_MAX_STUDENTS", cast=int, default=10_000)
+REPORT_POLL_INTERVAL = env("REPORT_POLL_INTERVAL", cast=float, default=5.0)
+REPORT_JOB_TIMEOUT = env("REPORT_JOB_TIMEOUT", cast=float, default=300.0)
+REPORT_MAX_ATTEMPTS = env("REPORT_MAX_ATTEMPTS", cast=int, default=3)
+
+# Rows fetched from the server-side cursor and sent to the client at a time by the exports.
+EXPORT_CHUNK_SIZE = env("EXPORT_CHUNK_SIZE", cast=int, default=5000)
+
+# Writes invalidate the cache of every worker through FEED_CHANNEL and CACHE_CHANNEL notifications. With the
+# local feed broker they only reach the worker that made them, so entries are kept for a few seconds by default.
+CACHE_MAX_ENTRIES = env("CACHE_MAX_ENTRIES", cast=int, default=10_000)
+CACHE_TTL = env("CACHE_TTL", cast=float, default=300.0 if FEED_BROKER == "postgres" else 5.0)
+CACHE_CHANNEL = env("CACHE_CHANNEL", cast=str, default="cache_invalidations")
@@ -1,21 +1,347 @@
-from typing import AsyncGenerator
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Callable, Dict, List, Optional
+from uuid import uuid4
 
-from sqlalchemy import MetaData
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from fastapi import Request
+from sqlalchemy import Executable, MetaData
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from .config import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
+from . import config
+from .admission import read_gate, write_gate
+from .config import (
+    DB_HOST, DB_MAX_OVERFLOW, DB_NAME, DB_PASSWORD, DB_PGBOUNCER, DB_POOL_PRE_PING, DB_POOL_RECYCLE,
+    DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_PORT, DB_REPLICA_MAX_LAG, DB_REPLICA_RETRY_AFTER, DB_REPLICA_STRATEGY,
+    DB_REPLICA_URLS, DB_STATEMENT_CACHE_SIZE, DB_USER
+)
 
+logger = logging.getLogger(__name__)
 
-DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+DATABASE_URL = config.DATABASE_URL or f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 Base = declarative_base()
 
 metadata = MetaData()
 
-engine = create_async_engine(DATABASE_URL, future=True)
-async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+PRIMARY_PIN_COOKIE = "read_primary_until"
+
+# Called with the seconds every pool checkout waited, in the context of the request that waited.
+pool_wait_listeners: List[Callable[[float], None]] = []
+
+# Called with every engine opened by `open_database()`, before it serves a query.
+engine_listeners: List[Callable[[AsyncEngine], None]] = []
+
+# Statements of the hot endpoints, executed on every connection opened by the pool warm-up so that they are
+# compiled and prepared before the first request. Their parameter values do not matter.
+warm_up_statements: List[Executable] = []
+
+
+class PoolStats:
+    """Counters of how long requests waited to get a connection from the pool."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.wait_time_total += seconds
+        self.wait_time_max = max(self.wait_time_max, seconds)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records the time spent waiting for, or opening, each connection it hands out."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.stats.record_wait(waited)
+            for listener in pool_wait_listeners:
+                listener(waited)
+
+
+def _connect_args() -> Dict:
+    if DB_PGBOUNCER:
+        # PgBouncer in transaction mode may hand each transaction a different server connection, so named
+        # prepared statements must be unique and never reused.
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    return {
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+    }
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        future=True,
+        poolclass=InstrumentedPool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=_connect_args(),
+    )
+
+
+# Bound to the engine by `open_database()`, which runs in the application's lifespan: nothing connects to the
+# database at import time, so workers can be forked safely and pointed at another database before they start.
+engine: Optional[AsyncEngine] = None
+async_session_maker = sessionmaker(class_=AsyncSession, expire_on_commit=False)
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    async with write_gate.admit(), async_session_maker() as session:
+        yield session
+
+
+class Replica:
+    """A read replica with its own engine, health state and count of sessions in use."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = _create_engine(url)
+        self.session_maker = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.in_use = 0
+        self.down_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self) -> None:
+        self.down_until = time.monotonic() + DB_REPLICA_RETRY_AFTER
+
+
+class ReplicaSet:
+    """Chooses which replica serves a read, skipping replicas that recently failed to connect."""
+
+    def __init__(self, strategy: str):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica strategy: {strategy}")
+        self.replicas: List[Replica] = []
+        self.strategy = strategy
+        self._next = itertools.count()
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def candidates(self) -> List[Replica]:
+        """Return the healthy replicas in the order they should be tried."""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if self.strategy == "least_connections":
+            return sorted(healthy, key=lambda replica: replica.in_use)
+        if not healthy:
+            return []
+        start = next(self._next) % len(healthy)
+        return healthy[start:] + healthy[:start]
+
+
+replicas = ReplicaSet(DB_REPLICA_STRATEGY)
+
+
+async def open_database(url: Optional[str] = None, warm_up: int = 0) -> None:
+    """
+    Create the primary and replica engines, and open `warm_up` connections in each pool.
+
+    Parameters:
+    - `url` (str, optional): The primary database URL, `DATABASE_URL` by default.
+    - `warm_up` (int): Connections to open and prepare the hot statements on, at most `DB_POOL_SIZE`.
+    """
+    global engine
+    engine = _create_engine(url or DATABASE_URL)
+    async_session_maker.configure(bind=engine)
+    replicas.replicas = [Replica(replica_url) for replica_url in DB_REPLICA_URLS]
+
+    engines = [engine] + [replica.engine for replica in replicas.replicas]
+    for opened in engines:
+        for listener in engine_listeners:
+            listener(opened)
+    if warm_up > 0:
+        await asyncio.gather(*(_warm_up(opened, min(warm_up, DB_POOL_SIZE)) for opened in engines))
+
+
+async def close_database() -> None:
+    """Close every connection of the primary and replica pools."""
+    global engine
+    for replica in replicas.replicas:
+        await replica.engine.dispose()
+    replicas.replicas = []
+    if engine is not None:
+        await engine.dispose()
+        engine = None
+    async_session_maker.configure(bind=None)
+
+
+async def _warm_up(engine: AsyncEngine, connections: int) -> None:
+    # All connections are held at once, so the pool opens a new one for each instead of reusing the first.
+    opened = await asyncio.gather(*(engine.connect() for _ in range(connections)), return_exceptions=True)
+    held = [connection for connection in opened if isinstance(connection, AsyncConnection)]
+    try:
+        if len(held) < connections:
+            error = next(connection for connection in opened if isinstance(connection, BaseException))
+            url = engine.url.render_as_string(hide_password=True)
+            logger.warning("Opened %d of %d connections to %s at startup: %s", len(held), connections, url, error)
+        await asyncio.gather(*(_prepare(connection) for connection in held))
+    finally:
+        for connection in held:
+            await connection.close()
+
+
+async def _prepare(connection: AsyncConnection) -> None:
+    if DB_PGBOUNCER:
+        # Prepared statements are not reused through PgBouncer; opening the connection is all there is to do.
+        return
+    try:
+        for statement in warm_up_statements:
+            await connection.execute(statement)
+    except SQLAlchemyError as e:
+        logger.warning("Could not prepare the hot statements at startup: %s", e)
+    finally:
+        await connection.rollback()
+
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """Yield a session for read-only endpoints; see `read_session()`."""
+    async with read_session(request) as session:
+        yield session
+
+
+@asynccontextmanager
+async def read_session(request: Request) -> AsyncIterator[AsyncSession]:
+    """
+    Open a session for a read-only request, once it is admitted by the read gate.
+
+    Reads go to a replica when replicas are configured, unless the client wrote something in the last
+    `DB_REPLICA_MAX_LAG` seconds. A replica that cannot be connected to is skipped for
+    `DB_REPLICA_RETRY_AFTER` seconds; when no replica is available the primary serves the read.
+    """
+    async with read_gate.admit():
+        async with _read_session(request) as session:
+            yield session
+
+
+@asynccontextmanager
+async def _read_session(request: Request) -> AsyncIterator[AsyncSession]:
+    if replicas and not _pinned_to_primary(request):
+        for replica in replicas.candidates():
+            session = replica.session_maker()
+            try:
+                await session.connection()
+            except PoolTimeoutError:
+                # The replica is busy rather than down: use the primary without marking it.
+                await session.close()
+                break
+            except (SQLAlchemyError, OSError):
+                replica.mark_down()
+                await session.close()
+                continue
+
+            session.info["replica"] = True
+            replica.in_use += 1
+            try:
+                yield session
+            finally:
+                replica.in_use -= 1
+                await session.close()
+            return
+
     async with async_session_maker() as session:
         yield session
+
+
+def replica_lag(session: AsyncSession) -> float:
+    """Return how stale the data read through `session` may be, in seconds."""
+    return DB_REPLICA_MAX_LAG if session.info.get("replica") else 0.0
+
+
+def read_only(endpoint: Callable) -> Callable:
+    """Mark an endpoint that does not write although its method is not GET, e.g. a query with a large body."""
+    endpoint.read_only = True
+    return endpoint
+
+
+async def pin_primary_after_write(request: Request, call_next):
+    """
+    HTTP middleware that sends a client's reads to the primary for a while after each successful write.
+
+    Requests with a method other than GET, HEAD or OPTIONS count as writes, unless their endpoint is `read_only`.
+    """
+    response = await call_next(request)
+    if replicas and DB_REPLICA_MAX_LAG > 0 and request.method not in ("GET", "HEAD", "OPTIONS"):
+        # The router has put the matched endpoint in the scope by now.
+        endpoint = request.scope.get("endpoint")
+        if response.status_code < 400 and not getattr(endpoint, "read_only", False):
+            until = time.time() + DB_REPLICA_MAX_LAG
+            response.set_cookie(PRIMARY_PIN_COOKIE, f"{until:.3f}", max_age=int(DB_REPLICA_MAX_LAG) + 1)
+    return response
+
+
+def _pinned_to_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _pool_status(engine: AsyncEngine) -> Dict:
+    pool = engine.pool
+    stats = pool.stats
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checkouts": stats.checkouts,
+        "timeouts": stats.timeouts,
+        "wait_time_avg": stats.wait_time_total / stats.checkouts if stats.checkouts else 0.0,
+        "wait_time_max": stats.wait_time_max,
+    }
+
+
+def get_pool_status() -> Dict:
+    """Return a snapshot of the occupancy and wait time counters of the primary and replica pools."""
+    if engine is None:
+        return {"primary": None, "replicas": []}
+    return {
+        "primary": _pool_status(engine),
+        "replicas": [
+            {
+                "url": make_url(replica.url).render_as_string(hide_password=True),
+                "healthy": replica.healthy,
+                "in_use": replica.in_use,
+                **_pool_status(replica.engine),
+            }
+            for replica in replicas.replicas
+        ],
+    }
@@ -0,0 +1,277 @@
+import asyncio
+import inspect
+import logging
+from dataclasses import asdict
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Sequence, Set, Union
+
+import asyncpg
+import orjson
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import database
+from ..config import FEED_BROKER, FEED_CHANNEL, FEED_QUEUE_SIZE, FEED_RECONNECT_DELAY
+from ..scores.signals import ScoreChange, on_score_change
+
+logger = logging.getLogger(__name__)
+
+if FEED_BROKER not in ("postgres", "local"):
+    raise ValueError(f"FEED_BROKER must be 'postgres' or 'local', got {FEED_BROKER!r}")
+
+# NOTIFY payloads must stay under 8000 bytes.
+MAX_PAYLOAD_SIZE = 7900
+
+# Sent to a subscriber instead of the events it could not keep up with, or that were missed while the listener
+# connection was down: the client should reload what it shows.
+RESYNC = {"action": "resync"}
+
+
+class Subscriber:
+    """
+    A bounded queue of events for one SSE or WebSocket client, optionally limited to some students.
+
+    When the queue is full the subscriber is dropped instead of slowing down the fan-out: its queue is
+    replaced by a single `resync` event, after which its stream ends.
+    """
+
+    def __init__(self, student_ids: FrozenSet[int], queue_size: int):
+        self.student_ids = student_ids
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.dropped = False
+
+    def push(self, event: dict) -> bool:
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.close()
+            return False
+
+    def close(self) -> None:
+        """Discard the queued events and end the stream with a `resync` event."""
+        self.dropped = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(RESYNC)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+class FeedHub:
+    """Fans score change events out to the subscribers interested in them."""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.events = 0
+        self.dropped = 0
+        self._subscribers: Set[Subscriber] = set()
+        # Subscribers to every student, and the others by student.
+        self._all: Set[Subscriber] = set()
+        self._by_student: Dict[int, Set[Subscriber]] = {}
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, student_ids: Sequence[int] = ()) -> Subscriber:
+        """Start receiving the changes of the scores of `student_ids`, or of every score if empty."""
+        subscriber = Subscriber(frozenset(student_ids), self.queue_size)
+        self._subscribers.add(subscriber)
+        if not subscriber.student_ids:
+            self._all.add(subscriber)
+        for student_id in subscriber.student_ids:
+            self._by_student.setdefault(student_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """Stop delivering changes to `subscriber`. Does nothing if it is not subscribed any more."""
+        if subscriber not in self._subscribers:
+            return
+        self._subscribers.discard(subscriber)
+        self._all.discard(subscriber)
+        for student_id in subscriber.student_ids:
+            group = self._by_student.get(student_id)
+            if group is not None:
+                group.discard(subscriber)
+                if not group:
+                    del self._by_student[student_id]
+
+    def publish(self, events: Sequence[dict]) -> None:
+        """Queue each event for the subscribers to every student and to the event's old or new student."""
+        for event in events:
+            self.events += 1
+            targets = set(self._all)
+            for key in ("student_id", "old_student_id"):
+                group = self._by_student.get(event.get(key))
+                if group:
+                    targets.update(group)
+            for subscriber in targets:
+                if not subscriber.dropped and not subscriber.push(event):
+                    self.dropped += 1
+
+    def resync(self) -> None:
+        """Tell every subscriber that events may have been missed."""
+        for subscriber in self._subscribers:
+            if not subscriber.dropped:
+                subscriber.close()
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self), "events": self.events, "dropped": self.dropped}
+
+
+hub = FeedHub(FEED_QUEUE_SIZE)
+
+
+def change_event(change: ScoreChange) -> dict:
+    return asdict(change)
+
+
+async def notify_score_changes(session: AsyncSession, changes: Sequence[ScoreChange]) -> None:
+    """
+    Send score changes to the feed of every worker as part of the session's transaction.
+
+    Postgres only delivers the notifications once the transaction commits, so call this before committing.
+    Does nothing with the in-process broker, which is fed by the score change signal instead.
+    """
+    await notify(session, FEED_CHANNEL, [change_event(change) for change in changes])
+
+
+async def notify(session: AsyncSession, channel: str, events: Sequence[Any]) -> None:
+    """
+    Send JSON-compatible events to the `channel` handlers of every worker once the session's transaction commits.
+
+    Does nothing with the in-process broker.
+    """
+    if FEED_BROKER != "postgres" or not events:
+        return
+    await session.execute(
+        text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+        {"channel": channel, "payloads": _payloads(events)},
+    )
+
+
+def _payloads(events: Sequence[Any]) -> List[str]:
+    # As few JSON arrays as fit in the NOTIFY payload limit.
+    payloads, batch, size = [], [], 2
+    for event in events:
+        encoded = orjson.dumps(event)
+        if batch and size + len(encoded) + 1 > MAX_PAYLOAD_SIZE:
+            payloads.append(b"[" + b",".join(batch) + b"]")
+            batch, size = [], 2
+        batch.append(encoded)
+        size += len(encoded) + 1
+    if batch:
+        payloads.append(b"[" + b",".join(batch) + b"]")
+    return [payload.decode() for payload in payloads]
+
+
+NotificationHandler = Callable[[List[Any]], Union[None, Awaitable[None]]]
+
+
+class PostgresListener:
+    """
+    The single LISTEN connection of a worker, outside of the connection pool.
+
+    Each notification is a JSON array of events, passed to the handlers of its channel. Reconnects after
+    `FEED_RECONNECT_DELAY` seconds when the connection is lost, then calls the reconnect handlers, as the
+    notifications sent meanwhile are gone.
+    """
+
+    def __init__(self, reconnect_delay: float):
+        self.reconnect_delay = reconnect_delay
+        self._handlers: Dict[str, List[NotificationHandler]] = {}
+        self._reconnect_handlers: List[Callable[[], Union[None, Awaitable[None]]]] = []
+        self._pending: Set[asyncio.Task] = set()
+        self._connection: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lost: Optional[asyncio.Event] = None
+
+    def listen(self, channel: str, handler: NotificationHandler) -> None:
+        """Call `handler` with the events of every notification on `channel`. Register handlers before `start()`."""
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def on_reconnect(self, handler: Callable[[], Union[None, Awaitable[None]]]) -> None:
+        """Call `handler` after the connection was lost and restored."""
+        self._reconnect_handlers.append(handler)
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        try:
+            await self._connect()
+        except (OSError, asyncpg.PostgresError) as e:
+            logger.warning("Could not listen for notifications at startup: %s", e)
+        self._task = asyncio.create_task(self._reconnect_when_lost())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def _connect(self) -> None:
+        url = make_url(database.engine.url).set(drivername="postgresql")
+        self._lost = asyncio.Event()
+        self._connection = await asyncpg.connect(url.render_as_string(hide_password=False))
+        self._connection.add_termination_listener(lambda connection: self._lost.set())
+        for channel in self._handlers:
+            await self._connection.add_listener(channel, self._on_notification)
+
+    async def _reconnect_when_lost(self) -> None:
+        while True:
+            if self._connection is not None:
+                await self._lost.wait()
+                logger.warning("Lost the notification listener connection")
+                self._connection = None
+            await asyncio.sleep(self.reconnect_delay)
+            try:
+                await self._connect()
+            except (OSError, asyncpg.PostgresError) as e:
+                logger.warning("Could not reconnect the notification listener: %s", e)
+                continue
+            for handler in self._reconnect_handlers:
+                self._call(handler)
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            events = orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            logger.warning("Ignoring a malformed notification on %s: %.200s", channel, payload)
+            return
+        for handler in self._handlers.get(channel, ()):
+            self._call(handler, events)
+
+    def _call(self, handler: Callable[..., Union[None, Awaitable[None]]], *args: Any) -> None:
+        # Handlers run one after the other; a failing one must not keep the others from running.
+        try:
+            result = handler(*args)
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result)
+                self._pending.add(task)
+                task.add_done_callback(self._finished)
+        except Exception:
+            logger.exception("Notification handler %r failed", handler)
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Notification handler failed", exc_info=task.exception())
+
+
+listener = PostgresListener(FEED_RECONNECT_DELAY) if FEED_BROKER == "postgres" else None
+
+if listener is not None:
+    listener.listen(FEED_CHANNEL, hub.publish)
+    listener.on_reconnect(hub.resync)
+
+if FEED_BROKER == "local":
+    @on_score_change
+    def _publish_locally(changes: Sequence[ScoreChange]) -> None:
+        hub.publish([change_event(change) for change in changes])
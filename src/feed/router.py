@@ -0,0 +1,108 @@
+import asyncio
+from typing import AsyncIterator, List
+
+import orjson
+from fastapi import APIRouter, HTTPException, Query, WebSocket
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from .hub import Subscriber, hub
+from ..config import FEED_HEARTBEAT, FEED_MAX_SUBSCRIBERS
+
+router = APIRouter(
+    prefix="/feed",
+    tags=["Feed"]
+)
+
+# Closing code telling a WebSocket client that it fell behind or the feed is full, and should reconnect later.
+TRY_AGAIN_LATER = 1013
+
+
+@router.get("/scores")
+async def stream_score_changes(student_id: List[int] = Query([])):
+    """
+    Stream score changes as Server-Sent Events.
+
+    Every created, updated or deleted score is sent as an event named after the action, with the score ID,
+    the student ID and score and, for updates, the previous student ID and score as JSON data. A comment
+    line is sent every `FEED_HEARTBEAT` seconds to keep idle connections open. Streams do not use a
+    database connection.
+
+    A client that falls more than `FEED_QUEUE_SIZE` events behind, or that may have missed events because the
+    worker lost its database listener, receives a `resync` event and the stream ends: it should reload what
+    it shows and reconnect.
+
+    Parameters:
+    - `student_id` (List[int], optional): Only stream the changes of these students' scores, including
+      scores moved to or from them. Repeat the parameter for several students; all scores by default.
+
+    Returns:
+    - `StreamingResponse`: A `text/event-stream` response.
+
+    Raises:
+    - `HTTPException` 503: If the worker already serves `FEED_MAX_SUBSCRIBERS` streams.
+    """
+    if len(hub) >= FEED_MAX_SUBSCRIBERS:
+        raise HTTPException(status_code=503, detail="Too many feed subscribers, please retry later.")
+
+    subscriber = hub.subscribe(student_id)
+    return StreamingResponse(
+        _event_stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Runs when the stream ends, including when the client disconnects.
+        background=BackgroundTask(hub.unsubscribe, subscriber),
+    )
+
+
+async def _event_stream(subscriber: Subscriber) -> AsyncIterator[bytes]:
+    yield b"retry: 1000\n\n"
+    while True:
+        try:
+            event = await asyncio.wait_for(subscriber.get(), FEED_HEARTBEAT)
+        except asyncio.TimeoutError:
+            yield b": heartbeat\n\n"
+            continue
+        yield b"event: " + event["action"].encode() + b"\ndata: " + orjson.dumps(event) + b"\n\n"
+        if subscriber.dropped:
+            return
+
+
+@router.websocket("/scores/ws")
+async def score_changes_websocket(websocket: WebSocket, student_id: List[int] = Query([])):
+    """
+    Send score changes over a WebSocket, one JSON text message per change.
+
+    The messages are the data of the Server-Sent Events of `GET /feed/scores`, with the action in the `action`
+    field. After a `resync` message the server closes the connection with code 1013; it does the same right
+    away when the worker already serves `FEED_MAX_SUBSCRIBERS` subscribers. Messages from the client are ignored.
+
+    Parameters:
+    - `student_id` (List[int], optional): Only send the changes of these students' scores; all scores by default.
+    """
+    if len(hub) >= FEED_MAX_SUBSCRIBERS:
+        await websocket.close(code=TRY_AGAIN_LATER)
+        return
+
+    await websocket.accept()
+    subscriber = hub.subscribe(student_id)
+    disconnected = asyncio.create_task(_wait_for_disconnect(websocket))
+    try:
+        while True:
+            event = asyncio.create_task(subscriber.get())
+            await asyncio.wait({event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                event.cancel()
+                return
+            await websocket.send_text(orjson.dumps(event.result()).decode())
+            if subscriber.dropped:
+                await websocket.close(code=TRY_AGAIN_LATER)
+                return
+    finally:
+        disconnected.cancel()
+        hub.unsubscribe(subscriber)
+
+
+async def _wait_for_disconnect(websocket: WebSocket) -> None:
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
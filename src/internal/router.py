@@ -0,0 +1,45 @@
+from fastapi import APIRouter
+
+from ..admission import read_gate, write_gate
+from ..cache import cache
+from ..database import get_pool_status
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["Internal"]
+)
+
+
+@router.get("/cache")
+async def get_cache_stats():
+    """
+    Read the counters of the student and score read cache.
+
+    Returns:
+    - `dict`: Hits, misses, hit ratio and invalidations, plus entry and eviction counts for the in-process backend.
+    """
+    return cache.stats()
+
+
+@router.get("/pool")
+async def get_pool_stats():
+    """
+    Read live statistics of the database connection pool.
+
+    Returns:
+    - `dict`: Pool size, checked-in, checked-out and overflow connections, and the number of checkouts,
+      pool timeouts and the average and maximum time in seconds spent waiting for a connection.
+    """
+    return get_pool_status()
+
+
+@router.get("/admission")
+async def get_admission_stats():
+    """
+    Read the state of the read and write admission gates.
+
+    Returns:
+    - `dict`: For each gate, its limit, the requests being served and waiting, and how many were admitted
+      and rejected since startup.
+    """
+    return {"read": read_gate.stats(), "write": write_gate.stats()}
@@ -0,0 +1,46 @@
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+
+from .schemas import Leaderboard
+from .service import leaderboard
+from ..config import LEADERBOARD_MAX_N
+
+router = APIRouter(
+    prefix="/leaderboard",
+    tags=["Leaderboard"]
+)
+
+
+@router.get("", response_model=Leaderboard)
+async def get_leaderboard(
+        metric: Literal["avg", "total"] = "avg",
+        n: int = Query(10, ge=1, le=LEADERBOARD_MAX_N)
+):
+    """
+    Read the best students by average or total score.
+
+    Served from memory without touching the database. Changes made through this worker are reflected at once,
+    changes made through other workers after the next consistency check (`LEADERBOARD_CHECK_INTERVAL`).
+
+    Parameters:
+    - `metric` (str): Rank by average (`avg`) or total (`total`) score.
+    - `n` (int): The number of students to return, at most `LEADERBOARD_MAX_N`.
+
+    Returns:
+    - `Leaderboard`: The students in rank order (1 is best, ties share a rank), the number of ranked
+      students and the time of the last check against the database.
+
+    Raises:
+    - `HTTPException` 503: If the leaderboard could not be loaded yet.
+    """
+    if not leaderboard.loaded:
+        raise HTTPException(status_code=503, detail="The leaderboard is not loaded yet, please retry later.")
+
+    return ORJSONResponse({
+        "metric": metric,
+        "total_students": len(leaderboard),
+        "checked_at": leaderboard.checked_at,
+        "entries": leaderboard.top(metric, n),
+    })
@@ -0,0 +1,17 @@
+from typing import List, Optional, Union
+from pydantic import BaseModel
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    student_id: int
+    value: Union[int, float]
+    score_count: int
+    score_total: int
+
+
+class Leaderboard(BaseModel):
+    metric: str
+    total_students: int
+    checked_at: Optional[float] = None
+    entries: List[LeaderboardEntry]
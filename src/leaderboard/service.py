@@ -0,0 +1,296 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import ARRAY, Integer, any_, bindparam, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..admission import read_gate
+from ..config import LEADERBOARD_CHECK_INTERVAL
+from ..database import async_session_maker
+from ..scores.signals import ScoreChange, on_score_change
+from ..students.models import StudentScoreStats as StatsModel
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("avg", "total")
+
+RankKey = Tuple[float, int]
+
+# Students compared between two yields to the event loop during a consistency check.
+SYNC_CHUNK_SIZE = 10_000
+# Times the students changed during the first load are read again, at most, before the load is considered done.
+SETTLE_ROUNDS = 5
+
+
+class RankedSet:
+    """
+    Sorted keys kept in buckets of at most `2 * load` keys.
+
+    Adding or removing a key bisects the bucket maxima, then the bucket, so it costs O(log n) comparisons
+    plus moving at most `2 * load` references; reading the first keys walks the buckets in order.
+    """
+
+    def __init__(self, load: int = 500):
+        self.load = load
+        self._buckets: List[List[RankKey]] = []
+        self._maxes: List[RankKey] = []
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def reset(self, keys: List[RankKey]) -> None:
+        keys.sort()
+        self._buckets = [keys[start:start + self.load] for start in range(0, len(keys), self.load)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._len = len(keys)
+
+    def add(self, key: RankKey) -> None:
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+            self._len = 1
+            return
+
+        index = min(bisect_left(self._maxes, key), len(self._maxes) - 1)
+        bucket = self._buckets[index]
+        insort(bucket, key)
+        self._maxes[index] = bucket[-1]
+        self._len += 1
+        if len(bucket) > 2 * self.load:
+            self._buckets[index:index + 1] = [bucket[:self.load], bucket[self.load:]]
+            self._maxes[index:index + 1] = [bucket[self.load - 1], bucket[-1]]
+
+    def remove(self, key: RankKey) -> None:
+        index = bisect_left(self._maxes, key)
+        bucket = self._buckets[index]
+        del bucket[bisect_left(bucket, key)]
+        self._len -= 1
+        if bucket:
+            self._maxes[index] = bucket[-1]
+        else:
+            del self._buckets[index]
+            del self._maxes[index]
+
+    def first(self, n: int) -> Iterator[RankKey]:
+        for bucket in self._buckets:
+            for key in bucket:
+                if n <= 0:
+                    return
+                yield key
+                n -= 1
+
+
+class Leaderboard:
+    """
+    Students ranked by the average and the total of their scores, kept in memory.
+
+    Built from the `student_score_stats` table at startup and updated with every score change of this worker,
+    including the changes that arrive while it is first built.
+    Every `check_interval` seconds it is compared with the table again and students that differ are corrected,
+    which also picks up the changes made by other worker processes.
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self.loaded = False
+        self.checks = 0
+        self.repairs = 0
+        self.checked_at: Optional[float] = None
+        # student_id -> (score count, score total)
+        self._totals: Dict[int, Tuple[int, int]] = {}
+        self._ranked = {metric: RankedSet() for metric in METRICS}
+        # Students changed while the table is being read; their rows may predate the change.
+        self._touched: Optional[Set[int]] = None
+        # Changes that arrived while the table is read for the first load, applied once it is done.
+        self._pending: Optional[List[ScoreChange]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._totals)
+
+    def top(self, metric: str, n: int) -> List[dict]:
+        """Return the `n` best students by `metric`; ties share a rank and are ordered by student ID."""
+        entries = []
+        rank = 0
+        previous = None
+        for position, (key, student_id) in enumerate(self._ranked[metric].first(n), start=1):
+            if key != previous:
+                rank, previous = position, key
+            count, total = self._totals[student_id]
+            entries.append({
+                "rank": rank,
+                "student_id": student_id,
+                "value": -key,
+                "score_count": count,
+                "score_total": total,
+            })
+        return entries
+
+    def apply(self, changes: Sequence[ScoreChange]) -> None:
+        if not self.loaded:
+            if self._pending is not None:
+                self._pending.extend(changes)
+            return
+        for change in changes:
+            if change.action == "created":
+                self._add(change.student_id, 1, change.score)
+            elif change.action == "deleted":
+                self._add(change.student_id, -1, change.score)
+            elif change.action == "updated":
+                self._add(change.old_student_id, -1, change.old_score)
+                self._add(change.student_id, 1, change.score)
+
+    async def sync(self) -> int:
+        """
+        Compare the leaderboard with the `student_score_stats` table and correct the students that differ.
+
+        Returns:
+        - `int`: The number of students corrected (every student on the first load).
+        """
+        first = not self.loaded
+        self._touched = set()
+        try:
+            async with read_gate.admit(), async_session_maker() as session:
+                if first:
+                    # Changes published from now on may or may not be counted in the rows read below.
+                    self._pending = []
+                rows = await self._read(session)
+                if first:
+                    self._load(rows)
+                    await self._settle(session)
+                    repaired = len(rows)
+
+            if not first:
+                repaired = 0
+                for index, student_id in enumerate(set(rows).union(self._totals)):
+                    if index % SYNC_CHUNK_SIZE == SYNC_CHUNK_SIZE - 1:
+                        # Let requests run in between; changes applied meanwhile mark their students as touched.
+                        await asyncio.sleep(0)
+                    if student_id in self._touched:
+                        continue
+                    row = rows.get(student_id, (0, 0))
+                    if self._totals.get(student_id, (0, 0)) != row:
+                        self._set(student_id, *row)
+                        repaired += 1
+                self.repairs += repaired
+        finally:
+            self._touched = None
+            self._pending = None
+
+        self.checks += 1
+        self.checked_at = time.time()
+        return repaired
+
+    async def start(self) -> None:
+        """Load the leaderboard and check it every `check_interval` seconds until `stop()`."""
+        try:
+            await self.sync()
+        except Exception as e:
+            logger.warning("Could not load the leaderboard at startup: %s", e)
+        if self.check_interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._check_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "students": len(self._totals),
+            "checks": self.checks,
+            "repairs": self.repairs,
+        }
+
+    async def _check_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                repaired = await self.sync()
+            except Exception as e:
+                logger.warning("Leaderboard consistency check failed: %s", e)
+                continue
+            if repaired:
+                logger.info("Leaderboard consistency check corrected %d students", repaired)
+
+    async def _read(self, session: AsyncSession, student_ids: Optional[Set[int]] = None) -> Dict[int, Tuple[int, int]]:
+        # Three Postgres arrays decode far faster than a row per student.
+        stmt = select(
+            func.array_agg(StatsModel.student_id),
+            func.array_agg(StatsModel.score_count),
+            func.array_agg(StatsModel.score_sum),
+        ).where(StatsModel.score_count > 0)
+        if student_ids is not None:
+            stmt = stmt.where(StatsModel.student_id == any_(bindparam("ids", list(student_ids), type_=ARRAY(Integer))))
+        student_ids, counts, totals = (await session.execute(stmt)).one()
+        return dict(zip(student_ids or [], zip(counts or [], totals or [])))
+
+    def _load(self, rows: Dict[int, Tuple[int, int]]) -> None:
+        # Only `_settle()` marks the leaderboard as loaded: the changes buffered meanwhile are not applied yet.
+        self._totals = dict(rows)
+        for metric in METRICS:
+            self._ranked[metric].reset([
+                (self._key(metric, count, total), student_id) for student_id, (count, total) in rows.items()
+            ])
+
+    async def _settle(self, session: AsyncSession) -> None:
+        """
+        Correct the students whose scores changed while the table was read for the first load, then mark the
+        leaderboard as loaded.
+
+        A change published during a read may have been committed before or after the read's snapshot, so it is
+        not replayed: its students are read again, which buffers the changes published during that read in turn.
+        """
+        for _ in range(SETTLE_ROUNDS):
+            student_ids = {
+                student_id
+                for change in self._pending
+                for student_id in (change.student_id, change.old_student_id)
+                if student_id is not None
+            }
+            if not student_ids:
+                break
+            self._pending = []
+            rows = await self._read(session, student_ids)
+            for student_id in student_ids:
+                self._set(student_id, *rows.get(student_id, (0, 0)))
+        else:
+            if self._pending:
+                logger.info("Leaderboard loaded while scores kept changing; the next check corrects the rest")
+        self._pending = None
+        self.loaded = True
+
+    def _add(self, student_id: Optional[int], count: int, score: Optional[int]) -> None:
+        if student_id is None or score is None or not self.loaded:
+            return
+        if self._touched is not None:
+            self._touched.add(student_id)
+        old_count, old_total = self._totals.get(student_id, (0, 0))
+        self._set(student_id, old_count + count, old_total + count * score)
+
+    def _set(self, student_id: int, count: int, total: int) -> None:
+        old = self._totals.pop(student_id, None)
+        for metric, ranked in self._ranked.items():
+            if old is not None:
+                ranked.remove((self._key(metric, *old), student_id))
+            if count > 0:
+                ranked.add((self._key(metric, count, total), student_id))
+        if count > 0:
+            self._totals[student_id] = (count, total)
+
+    @staticmethod
+    def _key(metric: str, count: int, total: int) -> float:
+        # Negated, so that the best students come first in ascending order.
+        return -(total / count) if metric == "avg" else -total
+
+
+leaderboard = Leaderboard(LEADERBOARD_CHECK_INTERVAL)
+on_score_change(leaderboard.apply)
@@ -1,4 +1,23 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from .admission import Overloaded, overloaded_handler
+from .analytics.router import router as analytics_router
+from .config import DB_POOL_WARM_UP
+from .database import close_database, open_database, pin_primary_after_write
+from .export.router import router as export_router
+from .feed.hub import listener as feed_listener
+from .feed.router import router as feed_router
+from .internal.router import router as internal_router
+from .leaderboard.router import router as leaderboard_router
+from .leaderboard.service import leaderboard
+from .metrics import MetricsMiddleware, instrument_database, router as metrics_router
+from .reports.router import router as reports_router
+from .reports.service import report_runner
+from .scores.batcher import score_batcher
+from .scores.partitions import partition_maintenance
 from .scores.router import router as scores_router
 from .students.router import router as students_router
 
@@ -18,17 +37,83 @@ You can perform CRUD operations on students and scores, including creating, read
 * **Add a score to a certain student**;
 * **Update a score information**;
 * **Delete a score**.
+
+### Analytics
+* **Distribution, percentiles and histogram of all scores**;
+* **Rank of a student by average or total score**.
+
+### Leaderboard
+* **Best students by average or total score, served from memory**.
+
+### Feed
+* **Live score changes, optionally of some students, over Server-Sent Events or a WebSocket**.
+
+### Reports
+* **Report cards of a set of students, generated in the background on a process pool**.
+
+### Export
+* **Stream every score with its student as CSV or NDJSON**.
 """
 
-app = FastAPI(
-    title="Online grades book",
-    description=description,
-    version="1.0.0",
-    contact={
-        "name": "Kairat Tussupbekov: tussupbekov@gmail.com",
-        "email": "tussupbekov@gmail.com",
-    },
-)
-
-app.include_router(students_router)
-app.include_router(scores_router)
+
+def create_app(database_url: Optional[str] = None, warm_up: int = DB_POOL_WARM_UP) -> FastAPI:
+    """
+    Build the application. The database is connected when the application starts, not when it is built.
+
+    Parameters:
+    - `database_url` (str, optional): The primary database URL, `DATABASE_URL` by default.
+    - `warm_up` (int): Connections opened and prepared at startup, `DB_POOL_WARM_UP` by default.
+
+    Returns:
+    - `FastAPI`: The application.
+    """
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        await open_database(database_url, warm_up)
+        await partition_maintenance.start()
+        await leaderboard.start()
+        if feed_listener is not None:
+            await feed_listener.start()
+        await report_runner.start()
+        try:
+            yield
+        finally:
+            await report_runner.stop()
+            if feed_listener is not None:
+                await feed_listener.stop()
+            await leaderboard.stop()
+            await partition_maintenance.stop()
+            if score_batcher is not None:
+                await score_batcher.drain()
+            await close_database()
+
+    app = FastAPI(
+        title="Online grades book",
+        description=description,
+        version="1.0.0",
+        contact={
+            "name": "Kairat Tussupbekov: tussupbekov@gmail.com",
+            "email": "tussupbekov@gmail.com",
+        },
+        default_response_class=ORJSONResponse,
+        lifespan=lifespan,
+    )
+
+    app.add_exception_handler(Overloaded, overloaded_handler)
+    app.middleware("http")(pin_primary_after_write)
+    app.add_middleware(MetricsMiddleware)
+    instrument_database()
+
+    app.include_router(students_router)
+    app.include_router(scores_router)
+    app.include_router(analytics_router)
+    app.include_router(leaderboard_router)
+    app.include_router(feed_router)
+    app.include_router(reports_router)
+    app.include_router(export_router)
+    app.include_router(internal_router)
+    app.include_router(metrics_router)
+    return app
+
+
+app = create_app()
@@ -0,0 +1,107 @@
+"""
+Administrative commands.
+
+Usage: `python -m src.manage <command> [options]`
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from pathlib import Path
+
+from .config import SCORE_PARTITIONS_AHEAD
+from .database import async_session_maker, close_database, open_database
+from .scores.partitions import archive_partitions, create_partitions, current_term
+from .students.stats import rebuild_stats
+
+
+async def _rebuild_stats(args: argparse.Namespace) -> None:
+    async with async_session_maker() as session:
+        count = await rebuild_stats(session)
+    print(f"Rebuilt score stats for {count} students.")
+
+
+async def _create_partitions(args: argparse.Namespace) -> None:
+    async with async_session_maker() as session:
+        created = await create_partitions(await session.connection(), args.ahead)
+        await session.commit()
+    print(f"Created partitions: {', '.join(created)}." if created else "All partitions exist.")
+
+
+def _create_partitions_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--ahead", type=int, default=SCORE_PARTITIONS_AHEAD,
+        help=f"Number of terms after the current one to create (default: {SCORE_PARTITIONS_AHEAD}).",
+    )
+
+
+async def _archive_scores(args: argparse.Namespace) -> None:
+    if args.before > current_term()[0]:
+        raise SystemExit("Only terms that ended before the current one can be archived.")
+
+    async with async_session_maker() as session:
+        names = await archive_partitions(session, args.before, args.directory, args.dry_run)
+        if not names:
+            print("No terms to archive.")
+            return
+        if args.dry_run:
+            print(f"Would archive: {', '.join(names)}.")
+            return
+
+        destination = f"files in {args.directory}" if args.directory else "the archive schema"
+        print(f"Archived {', '.join(names)} to {destination}.")
+        # The summaries still include the archived scores.
+        count = await rebuild_stats(session)
+    print(f"Rebuilt score stats for {count} students.")
+
+
+def _archive_scores_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--before", type=datetime.fromisoformat, required=True,
+        help="Archive the terms that ended on or before this date, e.g. 2026-01-01.",
+    )
+    parser.add_argument(
+        "--directory", type=Path,
+        help="Write each term to <directory>/<partition>.csv.gz and drop it, instead of moving it to the "
+             "archive schema.",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Only list the terms that would be archived.")
+
+
+COMMANDS = {
+    "rebuild-stats": (
+        _rebuild_stats, "Recompute the per-student score summaries from the scores table.", None
+    ),
+    "create-partitions": (
+        _create_partitions, "Create the scores partitions of the current and upcoming terms.",
+        _create_partitions_arguments,
+    ),
+    "archive-scores": (
+        _archive_scores, "Detach the scores of closed terms into archive tables or compressed files.",
+        _archive_scores_arguments,
+    ),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.manage", description="Online grades book administration.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text, add_arguments) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        if add_arguments is not None:
+            add_arguments(subparser)
+
+    args = parser.parse_args()
+    handler, _, _ = COMMANDS[args.command]
+    asyncio.run(_run(handler, args))
+
+
+async def _run(handler, args: argparse.Namespace) -> None:
+    await open_database()
+    try:
+        await handler(args)
+    finally:
+        await close_database()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .admission import read_gate, write_gate
+from .cache import cache
+from .feed.hub import hub as feed_hub
+from .leaderboard.service import leaderboard
+from .reports.service import report_runner
+from .scores.batcher import score_batcher
+from .database import engine_listeners, get_pool_status, pool_wait_listeners
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Metric:
+    """Base class of the metrics rendered in the Prometheus text exposition format."""
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        REGISTRY.append(self)
+
+    def samples(self) -> Iterable[Tuple[str, Labels, float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield self.name, labels, value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        # Per-bucket counts followed by the +Inf count and the sum of all observations.
+        counts = self._values.get(key)
+        if counts is None:
+            counts = self._values[key] = [0.0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        else:
+            counts[-2] += 1
+        counts[-1] += value
+
+    def samples(self):
+        for labels, counts in self._values.items():
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + (("le", _format_value(bound)),), cumulative
+            yield f"{self.name}_count", labels, cumulative
+            yield f"{self.name}_sum", labels, counts[-1]
+
+
+class CallbackMetric(Metric):
+    """A metric whose samples are read from the application when the metrics are scraped."""
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            metric_type: str,
+            callback: Callable[[], Iterable[Tuple[Labels, float]]]
+    ):
+        super().__init__(name, documentation)
+        self.type = metric_type
+        self.callback = callback
+
+    def samples(self):
+        for labels, value in self.callback():
+            yield self.name, labels, value
+
+
+REGISTRY: List[Metric] = []
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by method, route and status code.")
+HTTP_REQUEST_DURATION = Histogram("http_request_duration_seconds", "HTTP request latency by method and route.")
+HTTP_IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests currently being served, by method.")
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "Database queries issued per HTTP request, by method and route.", QUERY_COUNT_BUCKETS
+)
+HTTP_REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds", "Time spent executing database queries per HTTP request, by method and route."
+)
+HTTP_REQUEST_POOL_WAIT = Histogram(
+    "http_request_pool_wait_seconds", "Time spent waiting for pooled connections per HTTP request, by method and route."
+)
+DB_QUERIES = Counter("db_queries_total", "Database queries executed.")
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "Database query execution time.")
+
+
+class RequestDBUsage:
+    """Database work attributed to the request being served."""
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.pool_wait = 0.0
+
+
+_request_db_usage: ContextVar[Optional[RequestDBUsage]] = ContextVar("request_db_usage", default=None)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status codes, in-flight requests and database usage per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        usage = RequestDBUsage()
+        token = _request_db_usage.set(usage)
+        HTTP_IN_PROGRESS.inc(method=method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_PROGRESS.dec(method=method)
+            _request_db_usage.reset(token)
+
+            route = scope.get("route")
+            path = getattr(route, "path", "<unmatched>")
+            HTTP_REQUESTS.inc(method=method, route=path, status=str(status_code))
+            HTTP_REQUEST_DURATION.observe(elapsed, method=method, route=path)
+            HTTP_REQUEST_DB_QUERIES.observe(usage.queries, method=method, route=path)
+            HTTP_REQUEST_DB_DURATION.observe(usage.query_time, method=method, route=path)
+            HTTP_REQUEST_POOL_WAIT.observe(usage.pool_wait, method=method, route=path)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_query(conn)
+
+
+def _handle_error(exception_context):
+    if exception_context.connection is not None and exception_context.connection.info.get("query_started"):
+        _record_query(exception_context.connection)
+
+
+def _record_query(conn):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    DB_QUERIES.inc()
+    DB_QUERY_DURATION.observe(elapsed)
+    usage = _request_db_usage.get()
+    if usage is not None:
+        usage.queries += 1
+        usage.query_time += elapsed
+
+
+def _record_pool_wait(seconds: float) -> None:
+    usage = _request_db_usage.get()
+    if usage is not None:
+        usage.pool_wait += seconds
+
+
+def instrument_engine(sync_engine: Engine) -> None:
+    """Count and time every query executed through `sync_engine`."""
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+def _instrument_async_engine(async_engine: AsyncEngine) -> None:
+    instrument_engine(async_engine.sync_engine)
+
+
+def instrument_database() -> None:
+    """Instrument the primary and replica engines once they are opened and attribute pool waits to requests."""
+    if _record_pool_wait in pool_wait_listeners:
+        return
+    engine_listeners.append(_instrument_async_engine)
+    pool_wait_listeners.append(_record_pool_wait)
+
+
+def _pool_samples(field: str):
+    def samples():
+        status = get_pool_status()
+        if status["primary"] is not None:
+            yield (("pool", "primary"),), status["primary"][field]
+        for replica in status["replicas"]:
+            yield (("pool", replica["url"]),), replica[field]
+    return samples
+
+
+def _cache_samples(field: str):
+    def samples():
+        stats = cache.stats()
+        if field in stats:
+            yield (), stats[field]
+    return samples
+
+
+def _admission_samples(field: str):
+    def samples():
+        for gate in (read_gate, write_gate):
+            yield (("gate", gate.name),), gate.stats()[field]
+    return samples
+
+
+def _batcher_samples(field: str):
+    def samples():
+        if score_batcher is not None:
+            yield (), score_batcher.stats()[field]
+    return samples
+
+
+def _feed_samples(field: str):
+    def samples():
+        yield (), feed_hub.stats()[field]
+    return samples
+
+
+def _report_samples(field: str):
+    def samples():
+        yield (), report_runner.stats()[field]
+    return samples
+
+
+def _leaderboard_samples(field: str):
+    def samples():
+        yield (), leaderboard.stats()[field]
+    return samples
+
+
+CallbackMetric("db_pool_size", "Connections kept open by the pool.", "gauge", _pool_samples("size"))
+CallbackMetric("db_pool_checked_out", "Connections currently checked out.", "gauge", _pool_samples("checked_out"))
+CallbackMetric("db_pool_overflow", "Overflow connections currently open.", "gauge", _pool_samples("overflow"))
+CallbackMetric("db_pool_checkouts_total", "Connection checkouts.", "counter", _pool_samples("checkouts"))
+CallbackMetric("db_pool_timeouts_total", "Checkouts that timed out.", "counter", _pool_samples("timeouts"))
+CallbackMetric("admission_active", "Requests admitted and using the database.", "gauge", _admission_samples("active"))
+CallbackMetric("admission_waiting", "Requests waiting to be admitted.", "gauge", _admission_samples("waiting"))
+CallbackMetric("admission_rejected_total", "Requests rejected with 503.", "counter", _admission_samples("rejected"))
+CallbackMetric("cache_hits_total", "Read cache hits.", "counter", _cache_samples("hits"))
+CallbackMetric("cache_misses_total", "Read cache misses.", "counter", _cache_samples("misses"))
+CallbackMetric("cache_invalidations_total", "Read cache keys invalidated.", "counter", _cache_samples("invalidations"))
+CallbackMetric("cache_entries", "Entries in the in-process read cache.", "gauge", _cache_samples("entries"))
+CallbackMetric("score_batches_total", "Batches written by the score batcher.", "counter", _batcher_samples("batches"))
+CallbackMetric("score_batch_rows_total", "Scores written by the score batcher.", "counter", _batcher_samples("scores"))
+CallbackMetric("leaderboard_students", "Students on the leaderboard.", "gauge", _leaderboard_samples("students"))
+CallbackMetric(
+    "leaderboard_repairs_total", "Students corrected by leaderboard consistency checks.", "counter",
+    _leaderboard_samples("repairs"),
+)
+CallbackMetric("feed_subscribers", "Score change feed subscribers.", "gauge", _feed_samples("subscribers"))
+CallbackMetric("feed_events_total", "Score changes received by the feed.", "counter", _feed_samples("events"))
+CallbackMetric(
+    "feed_dropped_subscribers_total", "Feed subscribers disconnected for falling behind.", "counter",
+    _feed_samples("dropped"),
+)
+CallbackMetric("report_jobs_completed_total", "Report jobs completed.", "counter", _report_samples("completed"))
+CallbackMetric("report_jobs_failed_total", "Report jobs that failed.", "counter", _report_samples("failed"))
+
+
+def render_metrics() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in labels) + "}"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+router = APIRouter(tags=["Internal"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Read request, database, pool and cache metrics in the Prometheus text exposition format.
+
+    Returns:
+    - `str`: The metrics.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,29 @@
+import base64
+import binascii
+from typing import Optional
+
+import orjson
+from fastapi import HTTPException
+
+from .config import PAGE_SIZE_MAX
+
+
+def encode_cursor(last_id: int) -> str:
+    """Build the opaque cursor that points just past the row with `last_id`."""
+    return base64.urlsafe_b64encode(orjson.dumps({"id": last_id})).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Return the id a cursor points past, or `None` for the first page."""
+    if not cursor:
+        return None
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(payload["id"])
+    except (binascii.Error, orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page_size(limit: int) -> int:
+    """Clamp a requested page size to `PAGE_SIZE_MAX`."""
+    return min(limit, PAGE_SIZE_MAX)
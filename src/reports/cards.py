@@ -0,0 +1,123 @@
+"""
+The computations of the report cards, run in the report process pool.
+
+Only NumPy and plain values cross the process boundary, so this module must not import the rest of the app.
+"""
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+SECONDS_PER_DAY = 86_400.0
+# Trends are reported as the change of the score per TREND_DAYS days.
+TREND_DAYS = 30
+
+
+def student_aggregates(
+        student_ids: np.ndarray,
+        scores: np.ndarray,
+        times: np.ndarray,
+        term_edges: Sequence[float],
+        term_labels: Sequence[str]
+) -> Dict[int, dict]:
+    """
+    Summarize the scores of each student.
+
+    Parameters:
+    - `student_ids`, `scores`, `times` (np.ndarray): One element per score; `times` in seconds since the epoch.
+    - `term_edges` (Sequence[float]): The starts of consecutive terms and the end of the last one, covering `times`.
+    - `term_labels` (Sequence[str]): The name of each term, one fewer than `term_edges`.
+
+    Returns:
+    - `Dict[int, dict]`: Per student with scores, the count, mean, standard deviation, minimum, maximum and latest
+      score, the trend (least-squares slope per `TREND_DAYS` days, `None` below two distinct times) and the mean
+      of every term with scores.
+    """
+    if not len(scores):
+        return {}
+
+    order = np.lexsort((times, student_ids))
+    student_ids, scores, times = student_ids[order], scores[order], times[order]
+    students, starts, counts = np.unique(student_ids, return_index=True, return_counts=True)
+    group = np.repeat(np.arange(len(students)), counts)
+    ends = starts + counts - 1
+
+    totals = np.bincount(group, weights=scores)
+    means = totals / counts
+    variances = np.maximum(np.bincount(group, weights=scores * scores) / counts - means * means, 0.0)
+
+    # Days since each student's first score keep the sums of the regression small enough to stay exact.
+    days = (times - times[starts][group]) / SECONDS_PER_DAY
+    sum_x = np.bincount(group, weights=days)
+    sum_xx = np.bincount(group, weights=days * days)
+    sum_xy = np.bincount(group, weights=days * scores)
+    denominator = counts * sum_xx - sum_x * sum_x
+    has_trend = denominator > 1e-9
+    slopes = np.divide(
+        counts * sum_xy - sum_x * totals, denominator, out=np.zeros_like(denominator), where=has_trend
+    ) * TREND_DAYS
+
+    terms = np.clip(np.searchsorted(term_edges, times, side="right") - 1, 0, len(term_labels) - 1)
+    term_keys = group * len(term_labels) + terms
+    term_counts = np.bincount(term_keys, minlength=len(students) * len(term_labels))
+    term_totals = np.bincount(term_keys, weights=scores, minlength=len(students) * len(term_labels))
+
+    result = {}
+    for index, student_id in enumerate(students.tolist()):
+        row = slice(index * len(term_labels), (index + 1) * len(term_labels))
+        result[student_id] = {
+            "count": int(counts[index]),
+            "mean": float(means[index]),
+            "stddev": float(np.sqrt(variances[index])),
+            "min": float(scores[starts[index]:ends[index] + 1].min()),
+            "max": float(scores[starts[index]:ends[index] + 1].max()),
+            "latest": float(scores[ends[index]]),
+            "trend": float(slopes[index]) if has_trend[index] else None,
+            "terms": [
+                {"term": label, "count": int(count), "mean": float(total / count)}
+                for label, count, total in zip(term_labels, term_counts[row], term_totals[row])
+                if count
+            ],
+        }
+    return result
+
+
+def compare_with_class(student_ids: List[int], means: List[float]) -> dict:
+    """
+    Place each student's mean score within the class formed by all the students of the report.
+
+    Returns:
+    - `dict`: `summary` with the class size, mean, standard deviation and quartiles of the students' means, and
+      `students` with, per student, the rank (1 is best, ties share a rank), percentile, difference from the class
+      mean and z-score.
+    """
+    if not means:
+        return {"summary": {"students": 0}, "students": {}}
+
+    values = np.asarray(means, dtype=np.float64)
+    ordered = np.sort(values)
+    mean, stddev = float(values.mean()), float(values.std())
+    above = len(ordered) - np.searchsorted(ordered, values, side="right")
+    below = np.searchsorted(ordered, values, side="left")
+    quartiles = np.percentile(values, [25, 50, 75])
+
+    return {
+        "summary": {
+            "students": len(values),
+            "mean": mean,
+            "stddev": stddev,
+            "min": float(ordered[0]),
+            "p25": float(quartiles[0]),
+            "median": float(quartiles[1]),
+            "p75": float(quartiles[2]),
+            "max": float(ordered[-1]),
+        },
+        "students": {
+            student_id: {
+                "rank": int(above[index]) + 1,
+                "percentile": 100.0 * float(below[index]) / len(values),
+                "difference": float(values[index]) - mean,
+                "z_score": (float(values[index]) - mean) / stddev if stddev > 0 else 0.0,
+            }
+            for index, student_id in enumerate(student_ids)
+        },
+    }
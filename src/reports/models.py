@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Index, Integer, String, Text, TIMESTAMP, func
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from ..database import Base
+
+
+class ReportJob(Base):
+    __tablename__ = "report_jobs"
+    __table_args__ = (
+        # The runners look for the oldest queued job, or a running one whose runner went quiet.
+        Index("ix_report_jobs_status_created_at", "status", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    status = Column(String, nullable=False, server_default="queued")  # "queued", "running", "done" or "failed"
+    student_ids = Column(ARRAY(Integer), nullable=False)
+    total = Column(Integer, nullable=False)
+    progress = Column(Integer, nullable=False, server_default="0")
+    attempts = Column(Integer, nullable=False, server_default="0")
+    result = Column(JSONB, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+    started_at = Column(TIMESTAMP, nullable=True)
+    heartbeat_at = Column(TIMESTAMP, nullable=True)
+    finished_at = Column(TIMESTAMP, nullable=True)
+
+    def __repr__(self):
+        return f"Report job {self.id}: {self.status}"
@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import insert, select
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import ReportJob as ReportJobModel
+from .schemas import ReportJobRead, ReportRequest
+from .service import report_runner
+from ..database import get_async_session, get_read_session
+from ..serialization import schema_columns
+
+router = APIRouter(
+    prefix="/reports",
+    tags=["Reports"]
+)
+
+JOB_COLUMNS = schema_columns(ReportJobModel.__table__, ReportJobRead)
+
+
+@router.post("", response_model=ReportJobRead, status_code=202)
+async def create_report(report: ReportRequest, session: AsyncSession = Depends(get_async_session)):
+    """
+    Queue the generation of report cards for a set of students.
+
+    The job is stored in the database and run in the background on a process pool, so it survives restarts and
+    does not slow down the API. Poll `GET /reports/{job_id}` for its progress and result.
+
+    Parameters:
+    - `report` (ReportRequest): The IDs of the students, at most `REPORT_MAX_STUDENTS`; together they form
+      the class the students are compared with.
+    - `session` (AsyncSession, optional): A database session.
+
+    Returns:
+    - `ReportJobRead`: The queued job, with a `Location` header pointing to it.
+
+    Raises:
+    - `HTTPException` 500: If there is an internal server error.
+    """
+    try:
+        student_ids = list(dict.fromkeys(report.student_ids))
+        result = await session.execute(
+            insert(ReportJobModel)
+            .values(student_ids=student_ids, total=len(student_ids))
+            .returning(*JOB_COLUMNS)
+        )
+        job = result.one()._asdict()
+        await session.commit()
+        report_runner.wake()
+
+        return ORJSONResponse(job, status_code=202, headers={"Location": f"{router.prefix}/{job['id']}"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{job_id}", response_model=ReportJobRead)
+async def get_report(job_id: int, session: AsyncSession = Depends(get_read_session)):
+    """
+    Read the status of a report job, and its report cards once it is done.
+
+    Parameters:
+    - `job_id` (int): The ID of the job.
+    - `session` (AsyncSession): A database session.
+
+    Returns:
+    - `ReportJobRead`: The status (`queued`, `running`, `done` or `failed`), the number of students processed
+      out of the total, the error of a failed job and, when done, the result: a summary of the class and, per
+      student, the count, mean, spread, latest score, trend per 30 days, term means and placement in the class,
+      plus the requested IDs that do not exist.
+
+    Raises:
+    - `HTTPException` 404: If the job with the given ID is not found.
+    - `HTTPException` 500: If there is an internal server error.
+    """
+    try:
+        result = await session.execute(select(*JOB_COLUMNS).where(ReportJobModel.id == job_id))
+        job = result.one_or_none()
+
+        if not job:
+            raise NoResultFound
+
+        return ORJSONResponse(job._asdict())
+    except NoResultFound:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
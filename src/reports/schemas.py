@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+from ..config import REPORT_MAX_STUDENTS
+
+
+class ReportRequest(BaseModel):
+    student_ids: List[int] = Field(..., min_length=1, max_length=REPORT_MAX_STUDENTS)
+
+
+class ReportJobRead(BaseModel):
+    id: int
+    status: str
+    progress: int
+    total: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    result: Optional[dict] = None
@@ -0,0 +1,279 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import ARRAY, Float, Integer, and_, any_, bindparam, cast, func, or_, select, update
+from sqlalchemy.engine import Row
+
+from . import cards
+from .models import ReportJob as ReportJobModel
+from ..admission import read_gate, write_gate
+from ..config import (
+    REPORT_CHUNK_SIZE, REPORT_JOB_TIMEOUT, REPORT_MAX_ATTEMPTS, REPORT_POLL_INTERVAL, REPORT_WORKERS
+)
+from ..database import async_session_maker
+from ..scores.models import Score as ScoreModel
+from ..scores.partitions import next_term, term_start
+from ..students.models import Student as StudentModel
+
+logger = logging.getLogger(__name__)
+
+
+class JobLost(Exception):
+    """Raised when another runner took a job over, e.g. after this one could not record progress in time."""
+
+
+class ReportRunner:
+    """
+    Runs the queued report jobs of the `report_jobs` table, one at a time, until `stop()`.
+
+    The students of a job are read `chunk_size` at a time, with their scores as Postgres arrays, and summarized on
+    a pool of `workers` processes, so the event loop only fetches data and records progress. Every app worker runs
+    its own runner; a job is claimed with `FOR UPDATE SKIP LOCKED`, so each job runs once. A runner records a
+    heartbeat every third of `job_timeout` while it works on a job; a job without one for `job_timeout` seconds is
+    claimed again, until it has been tried `max_attempts` times. A runner only writes to a job while the job is
+    still on the attempt it claimed, so a runner that was taken over gives the job up.
+    """
+
+    def __init__(self, workers: int, chunk_size: int, poll_interval: float, job_timeout: float, max_attempts: int):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.job_timeout = job_timeout
+        self.max_attempts = max_attempts
+        self.completed = 0
+        self.failed = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    async def start(self) -> None:
+        if self.workers <= 0 or self._task is not None:
+            return
+        self._executor = self._new_executor()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # Spawned rather than forked: the app process has threads and open connections by now.
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def wake(self) -> None:
+        """Look for queued jobs now rather than after the poll interval."""
+        if self._wake is not None:
+            self._wake.set()
+
+    def stats(self) -> dict:
+        return {"completed": self.completed, "failed": self.failed}
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.warning("Could not claim a report job: %s", e)
+                job = None
+
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._process(job)
+
+    async def _claim(self) -> Optional[Row]:
+        stale = func.now() - timedelta(seconds=self.job_timeout)
+        async with write_gate.admit(), async_session_maker() as session:
+            result = await session.execute(
+                select(ReportJobModel.id, ReportJobModel.student_ids, ReportJobModel.attempts)
+                .where(or_(
+                    ReportJobModel.status == "queued",
+                    and_(ReportJobModel.status == "running", ReportJobModel.heartbeat_at < stale),
+                ))
+                .order_by(ReportJobModel.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            job = result.one_or_none()
+            if job is None:
+                return None
+
+            if job.attempts >= self.max_attempts:
+                await session.execute(update(ReportJobModel).where(ReportJobModel.id == job.id).values(
+                    status="failed",
+                    error=f"Gave up after {job.attempts} attempts",
+                    finished_at=func.now(),
+                ))
+                await session.commit()
+                self.failed += 1
+                # Look for another job right away.
+                self._wake.set()
+                return None
+
+            await session.execute(update(ReportJobModel).where(ReportJobModel.id == job.id).values(
+                status="running",
+                progress=0,
+                attempts=ReportJobModel.attempts + 1,
+                started_at=func.now(),
+                heartbeat_at=func.now(),
+            ))
+            await session.commit()
+        return job
+
+    async def _process(self, job: Row) -> None:
+        attempt = job.attempts + 1
+        try:
+            heartbeat = asyncio.create_task(self._keep_alive(job.id, attempt))
+            try:
+                result = await self._build(job.id, attempt, job.student_ids)
+            finally:
+                heartbeat.cancel()
+        except asyncio.CancelledError:
+            # Shutting down: give the job back rather than leaving it for the timeout.
+            await self._save(job.id, attempt, status="queued", progress=0, heartbeat_at=None)
+            raise
+        except JobLost:
+            logger.warning("Report job %d was taken over by another runner", job.id)
+            return
+        except Exception as e:
+            logger.warning("Report job %d failed: %s", job.id, e)
+            if isinstance(e, BrokenProcessPool):
+                # A pool process died, e.g. killed for memory; the pool cannot be used any more.
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+            if await self._save(job.id, attempt, status="failed", error=str(e), finished_at=func.now()):
+                self.failed += 1
+            return
+
+        if await self._save(job.id, attempt, status="done", result=result, finished_at=func.now()):
+            self.completed += 1
+        else:
+            logger.warning("Report job %d was taken over by another runner", job.id)
+
+    async def _keep_alive(self, job_id: int, attempt: int) -> None:
+        # Progress is only recorded per chunk, and a chunk can take a while on a cold or busy pool.
+        while True:
+            await asyncio.sleep(self.job_timeout / 3)
+            try:
+                if not await self._save(job_id, attempt, heartbeat_at=func.now()):
+                    return
+            except Exception as e:
+                logger.warning("Could not record the heartbeat of report job %d: %s", job_id, e)
+
+    async def _build(self, job_id: int, attempt: int, student_ids: List[int]) -> dict:
+        loop = asyncio.get_running_loop()
+        student_ids = list(dict.fromkeys(student_ids))
+        students: Dict[int, dict] = {}
+
+        for start in range(0, len(student_ids), self.chunk_size):
+            chunk = student_ids[start:start + self.chunk_size]
+            names, (score_student_ids, scores, times) = await self._fetch(chunk)
+            edges, labels = _terms(times)
+            aggregates = await loop.run_in_executor(
+                self._executor, cards.student_aggregates, score_student_ids, scores, times, edges, labels
+            )
+            for student_id, first_name, last_name in names:
+                students[student_id] = {
+                    "student_id": student_id,
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    **aggregates.get(student_id, {"count": 0}),
+                }
+            if not await self._save(job_id, attempt, progress=start + len(chunk), heartbeat_at=func.now()):
+                raise JobLost
+
+        ranked = [student_id for student_id in student_ids if students.get(student_id, {}).get("count")]
+        comparison = await loop.run_in_executor(
+            self._executor, cards.compare_with_class, ranked, [students[student_id]["mean"] for student_id in ranked]
+        )
+        for student_id, placement in comparison["students"].items():
+            students[student_id]["class"] = placement
+
+        return {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "class": comparison["summary"],
+            "students": [students[student_id] for student_id in student_ids if student_id in students],
+            "missing": [student_id for student_id in student_ids if student_id not in students],
+        }
+
+    async def _fetch(self, student_ids: List[int]) -> Tuple[List[Row], Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        async with read_gate.admit(), async_session_maker() as session:
+            result = await session.execute(
+                select(StudentModel.id, StudentModel.first_name, StudentModel.last_name)
+                .where(StudentModel.id == any_(bindparam("ids", student_ids, type_=ARRAY(Integer))))
+            )
+            names = result.all()
+            # Three Postgres arrays decode far faster than a row per score.
+            result = await session.execute(
+                select(
+                    func.array_agg(ScoreModel.student_id),
+                    func.array_agg(ScoreModel.score),
+                    func.array_agg(cast(func.extract("epoch", ScoreModel.created_at), Float)),
+                )
+                .where(
+                    ScoreModel.student_id == any_(bindparam("ids", student_ids, type_=ARRAY(Integer))),
+                    ScoreModel.score.is_not(None),
+                )
+            )
+            score_student_ids, scores, times = result.one()
+        return names, (
+            np.array(score_student_ids or [], dtype=np.int64),
+            np.array(scores or [], dtype=np.float64),
+            np.array(times or [], dtype=np.float64),
+        )
+
+    async def _save(self, job_id: int, attempt: int, **values) -> bool:
+        """Update a running job, unless it has been claimed again since `attempt`. Returns whether it was updated."""
+        async with write_gate.admit(), async_session_maker() as session:
+            result = await session.execute(
+                update(ReportJobModel)
+                .where(
+                    ReportJobModel.id == job_id,
+                    ReportJobModel.status == "running",
+                    ReportJobModel.attempts == attempt,
+                )
+                .values(**values)
+            )
+            await session.commit()
+        return result.rowcount > 0
+
+
+def _terms(times: np.ndarray) -> Tuple[List[float], List[str]]:
+    # The terms from the earliest to the latest score, as epoch second edges and `YYYY-MM` labels.
+    if not len(times):
+        return [0.0, 0.0], [""]
+    epoch = datetime(1970, 1, 1)
+    start = term_start(epoch + timedelta(seconds=float(times.min())))
+    last = epoch + timedelta(seconds=float(times.max()))
+    edges, labels = [], []
+    while start <= last:
+        edges.append((start - epoch).total_seconds())
+        labels.append(f"{start:%Y-%m}")
+        start = next_term(start)
+    edges.append((start - epoch).total_seconds())
+    return edges, labels
+
+
+report_runner = ReportRunner(
+    REPORT_WORKERS, REPORT_CHUNK_SIZE, REPORT_POLL_INTERVAL, REPORT_JOB_TIMEOUT, REPORT_MAX_ATTEMPTS
+)
@@ -0,0 +1,104 @@
+import asyncio
+import contextvars
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy.engine import Row
+
+from .schemas import ScoreBase
+from .service import ScoreRejected, created_changes, insert_scores
+from .signals import publish_score_changes
+from ..admission import write_gate
+from ..config import SCORE_BATCH_ENABLED, SCORE_BATCH_MAX_SIZE, SCORE_BATCH_MAX_WAIT
+from ..database import async_session_maker
+
+
+class ScoreBatcher:
+    """
+    Coalesces concurrent single-score inserts into one multi-row INSERT ... RETURNING and one commit.
+
+    The first score of a batch waits at most `max_wait` seconds for others to join it; a batch that reaches
+    `max_size` scores is written at once. Every caller gets its own row back, or its own error.
+    """
+
+    def __init__(self, max_wait: float, max_size: int):
+        self.max_wait = max_wait
+        self.max_size = max_size
+        self.batches = 0
+        self.scores = 0
+        self._pending: List[Tuple[ScoreBase, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def add(self, score: ScoreBase) -> Row:
+        """
+        Insert a score as part of the next batch and return its row once the batch is committed.
+
+        Raises:
+        - `StudentNotFound`: If the score's student does not exist.
+        - `ScoreRejected`: If the database refused the score for another reason.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((score, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    async def drain(self) -> None:
+        """Write the pending scores now and wait for every batch in flight, e.g. before shutting down."""
+        self._flush()
+        if self._flushes:
+            await asyncio.wait(set(self._flushes))
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "scores": self.scores,
+            "average_batch_size": self.scores / self.batches if self.batches else 0.0,
+            "pending": len(self._pending),
+        }
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        # Started in an empty context, so the batch's queries are not counted against whichever request
+        # happened to start it.
+        task = contextvars.Context().run(asyncio.create_task, self._write(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _write(self, batch: List[Tuple[ScoreBase, asyncio.Future]]) -> None:
+        try:
+            async with write_gate.admit(), async_session_maker() as session:
+                rows = await insert_scores(session, [score for score, _ in batch])
+                await session.commit()
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.scores += len(batch)
+        try:
+            # Listeners run before anyone is answered, so no caller can read a stale cache afterwards.
+            await publish_score_changes(created_changes(rows))
+        finally:
+            for (_, future), row in zip(batch, rows):
+                # The caller may have gone away (cancelled); its score is written regardless.
+                if future.done():
+                    continue
+                if isinstance(row, ScoreRejected):
+                    future.set_exception(row)
+                else:
+                    future.set_result(row)
+
+
+score_batcher = ScoreBatcher(SCORE_BATCH_MAX_WAIT, SCORE_BATCH_MAX_SIZE) if SCORE_BATCH_ENABLED else None
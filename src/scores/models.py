@@ -1,14 +1,19 @@
-from sqlalchemy import Column, Integer, TIMESTAMP, func, ForeignKey
+from sqlalchemy import Column, Index, Integer, TIMESTAMP, func, ForeignKey
 from sqlalchemy.orm import relationship
 from ..database import Base
 
 
 class Score(Base):
     __tablename__ = "scores"
+    __table_args__ = (
+        Index("ix_scores_student_id_created_at", "student_id", "created_at"),
+        # One partition per term, see `partitions.py`. The partition key has to be part of the primary key.
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     score = Column(Integer)
-    created_at = Column(TIMESTAMP, server_default=func.now())
+    created_at = Column(TIMESTAMP, primary_key=True, server_default=func.now())
     updated_at = Column(TIMESTAMP, onupdate=func.now(), nullable=True)
     student_id = Column(Integer, ForeignKey("students.id"))
 
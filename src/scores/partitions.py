@@ -0,0 +1,255 @@
+"""
+Range partitions of the `scores` table on `created_at`, one per term.
+
+Terms are `SCORE_TERM_MONTHS` months long and aligned to January 1st, so with the default of 6 months the
+partition `scores_2026_07` holds the scores created from July 1st 2026 (inclusive) to January 1st 2027.
+`scores_default` catches scores outside of every term partition. Times are naive UTC, like `created_at`.
+"""
+import asyncio
+import gzip
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from ..admission import write_gate
+from ..config import SCORE_PARTITION_CHECK_INTERVAL, SCORE_PARTITIONS_AHEAD, SCORE_TERM_MONTHS
+from ..database import async_session_maker
+
+logger = logging.getLogger(__name__)
+
+if 12 % SCORE_TERM_MONTHS:
+    raise ValueError(f"SCORE_TERM_MONTHS must divide 12, got {SCORE_TERM_MONTHS}")
+
+TABLE = "scores"
+DEFAULT_PARTITION = "scores_default"
+ARCHIVE_SCHEMA = "archive"
+
+_PARTITION_NAME = re.compile(r"^scores_(\d{4})_(\d{2})$")
+_BOUNDS = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+# Serializes partition DDL between workers; any constant works as long as it is the same everywhere.
+_LOCK_KEY = 7_361_205_001
+# DDL on `scores` waits for the queries using it; give up rather than queueing every later query behind it.
+_LOCK_TIMEOUT = "5s"
+
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    start: datetime
+    end: datetime
+
+
+def term_start(moment: datetime) -> datetime:
+    """Return the start of the term `moment` falls in."""
+    month = (moment.month - 1) // SCORE_TERM_MONTHS * SCORE_TERM_MONTHS + 1
+    return datetime(moment.year, month, 1)
+
+
+def next_term(start: datetime) -> datetime:
+    """Return the start of the term after the one starting at `start`."""
+    month = start.month - 1 + SCORE_TERM_MONTHS
+    return datetime(start.year + month // 12, month % 12 + 1, 1)
+
+
+def current_term() -> Tuple[datetime, datetime]:
+    """Return the start (inclusive) and end (exclusive) of the current term."""
+    start = term_start(datetime.now(timezone.utc).replace(tzinfo=None))
+    return start, next_term(start)
+
+
+def partition_name(start: datetime) -> str:
+    return f"{TABLE}_{start:%Y_%m}"
+
+
+def create_partition_sql(start: datetime) -> str:
+    return (
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(start)}" PARTITION OF {TABLE} '
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{next_term(start).isoformat()}')"
+    )
+
+
+async def list_partitions(connection: AsyncConnection) -> List[Partition]:
+    """Return the term partitions attached to `scores`, oldest first."""
+    result = await connection.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:table AS regclass)"
+    ), {"table": TABLE})
+    partitions = []
+    for name, bound in result:
+        match = _BOUNDS.search(bound)
+        if match:
+            start, end = (datetime.fromisoformat(value) for value in match.groups())
+            partitions.append(Partition(name, start, end))
+    return sorted(partitions, key=lambda partition: partition.start)
+
+
+async def create_partitions(connection: AsyncConnection, ahead: int = SCORE_PARTITIONS_AHEAD) -> List[str]:
+    """
+    Create the partitions of the current term and of the `ahead` terms after it that do not exist yet.
+
+    Runs in the connection's transaction and does not commit.
+
+    Returns:
+    - `List[str]`: The names of the partitions created.
+    """
+    await connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+    await connection.execute(text(f"SET LOCAL lock_timeout = '{_LOCK_TIMEOUT}'"))
+    existing = {partition.start for partition in await list_partitions(connection)}
+
+    created = []
+    start, _ = current_term()
+    for _ in range(ahead + 1):
+        if start not in existing:
+            try:
+                async with connection.begin_nested():
+                    await connection.execute(text(create_partition_sql(start)))
+                created.append(partition_name(start))
+            except DBAPIError as e:
+                # E.g. overlapping partitions after SCORE_TERM_MONTHS changed, or rows of the term already in
+                # the default partition: those have to be sorted out by hand.
+                logger.warning("Could not create the partition %s: %s", partition_name(start), e.orig)
+        start = next_term(start)
+    return created
+
+
+class PartitionMaintenance:
+    """Creates upcoming term partitions at startup and every `interval` seconds, before any score needs them."""
+
+    def __init__(self, interval: float, ahead: int):
+        self.interval = interval
+        self.ahead = ahead
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self) -> List[str]:
+        async with write_gate.admit(), async_session_maker() as session:
+            connection = await session.connection()
+            created = await create_partitions(connection, self.ahead)
+            await session.commit()
+        if created:
+            logger.info("Created score partitions %s", ", ".join(created))
+        return created
+
+    async def start(self) -> None:
+        if self.interval <= 0 or self._task is not None:
+            return
+        try:
+            await self.run()
+        except Exception as e:
+            logger.warning("Could not create the score partitions at startup: %s", e)
+        self._task = asyncio.create_task(self._run_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run()
+            except Exception as e:
+                logger.warning("Could not create the score partitions: %s", e)
+
+
+partition_maintenance = PartitionMaintenance(SCORE_PARTITION_CHECK_INTERVAL, SCORE_PARTITIONS_AHEAD)
+
+
+async def archive_partitions(
+        session: AsyncSession,
+        before: datetime,
+        directory: Optional[Path] = None,
+        dry_run: bool = False
+) -> List[str]:
+    """
+    Detach the term partitions that end on or before `before` and archive them.
+
+    Each partition is detached in its own short transaction, then either moved to the `archive` schema or,
+    with `directory`, written to `<directory>/<partition>.csv.gz` and dropped. Tables left detached by an
+    interrupted run are archived as well. Archived tables lose the foreign key to `students`, so that students
+    whose scores were archived can still be deleted.
+
+    Returns:
+    - `List[str]`: The names of the archived partitions.
+    """
+    connection = await session.connection()
+    closed = [partition.name for partition in await list_partitions(connection) if partition.end <= before]
+    pending = await _detached_partitions(connection)
+    await session.rollback()
+    if dry_run:
+        return sorted(set(pending).union(closed))
+
+    for name in closed:
+        connection = await session.connection()
+        await connection.execute(text(f"SET LOCAL lock_timeout = '{_LOCK_TIMEOUT}'"))
+        await connection.execute(text(f'ALTER TABLE {TABLE} DETACH PARTITION "{name}"'))
+        await session.commit()
+
+    # Tables archived before the foreign keys were dropped.
+    connection = await session.connection()
+    for name in await _archived_tables(connection):
+        await _drop_foreign_keys(connection, f'{ARCHIVE_SCHEMA}."{name}"')
+    await session.commit()
+
+    archived = []
+    for name in sorted(set(pending).union(closed)):
+        connection = await session.connection()
+        if directory is None:
+            await _drop_foreign_keys(connection, f'"{name}"')
+            await connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+            await connection.execute(text(f'ALTER TABLE "{name}" SET SCHEMA {ARCHIVE_SCHEMA}'))
+        else:
+            await _copy_to_file(connection, name, directory / f"{name}.csv.gz")
+            await connection.execute(text(f'DROP TABLE "{name}"'))
+        await session.commit()
+        archived.append(name)
+    return archived
+
+
+async def _detached_partitions(connection: AsyncConnection) -> List[str]:
+    # Term tables in the public schema that are not partitions (any more).
+    result = await connection.execute(text(
+        "SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = current_schema() AND c.relkind = 'r' AND NOT c.relispartition"
+    ))
+    return [name for name in result.scalars() if _PARTITION_NAME.match(name)]
+
+
+async def _archived_tables(connection: AsyncConnection) -> List[str]:
+    result = await connection.execute(text(
+        "SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = :schema AND c.relkind = 'r'"
+    ), {"schema": ARCHIVE_SCHEMA})
+    return [name for name in result.scalars() if _PARTITION_NAME.match(name)]
+
+
+async def _drop_foreign_keys(connection: AsyncConnection, table: str) -> None:
+    # A detached partition keeps the foreign key of `scores` to `students`, which `delete_student` only satisfies
+    # for the scores left in `scores`.
+    result = await connection.execute(text(
+        "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'"
+    ), {"table": table})
+    for constraint in result.scalars().all():
+        await connection.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{constraint}"'))
+
+
+async def _copy_to_file(connection: AsyncConnection, name: str, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    raw = await connection.get_raw_connection()
+    # Written to a temporary name first, so that a file with the final name is always complete.
+    partial = path.with_name(path.name + ".partial")
+    with gzip.open(partial, "wb") as output:
+        await raw.driver_connection.copy_from_table(name, output=output, format="csv", header=True)
+    partial.replace(path)
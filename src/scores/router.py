@@ -1,11 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from datetime import datetime
+from typing import AsyncGenerator, List, Mapping, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
+from pydantic import ValidationError
+from sqlalchemy import Select, delete, select, update
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from .batcher import score_batcher
 from .models import Score as ScoreModel
-from .schemas import ScoreBase, ScoreRead
-from ..database import get_async_session
+from .schemas import ScoreBase, ScoreBulkResult, ScoreBulkRow, ScorePage, ScoreRead
+from .service import SCORE_COLUMNS, ScoreRejected, StudentNotFound, created_changes, insert_scores
+from .signals import ScoreChange, publish_score_changes
+from ..admission import Overloaded, write_gate
+from ..bulk import Record, format_validation_error, iter_record_batches
+from ..cache import cache, score_key
+from ..conditional import (
+    is_conditional, is_not_modified, make_etag, not_modified, parse_timestamp, validator_headers
+)
+from ..config import BULK_BATCH_SIZE, PAGE_SIZE_DEFAULT
+from ..database import async_session_maker, get_async_session, get_read_session, replica_lag, warm_up_statements
+from ..feed.hub import notify_score_changes
+from ..pagination import decode_cursor, encode_cursor, page_size
+from ..serialization import row_dicts, to_jsonable
+from ..students.stats import record_score_removed, record_score_updated
 
 router = APIRouter(
     prefix="/score",
@@ -13,38 +32,145 @@ router = APIRouter(
 )
 
 
+async def get_insert_session() -> AsyncGenerator[Optional[AsyncSession], None]:
+    # Batched inserts are written with the batcher's own sessions, so they take no write slot while they wait.
+    if score_batcher is not None:
+        yield None
+        return
+    # Opened here rather than by iterating `get_async_session()`: an exception raised by the endpoint is only
+    # thrown into this generator, and a nested one would keep its slot and connection until garbage collected.
+    async with write_gate.admit(), async_session_maker() as session:
+        yield session
+
+
 @router.post("/", response_model=ScoreRead)
-async def add_score(score: ScoreBase, session: AsyncSession = Depends(get_async_session)):
+async def add_score(score: ScoreBase, session: Optional[AsyncSession] = Depends(get_insert_session)):
     """
     Add a new score.
 
+    With `SCORE_BATCH_ENABLED`, concurrent requests are written together: the score joins a batch that is
+    inserted and committed at once, which adds at most `SCORE_BATCH_MAX_WAIT` seconds of latency.
+
     Parameters:
     - `score` (ScoreBase): The score data to be created.
-    - `session` (AsyncSession): A database session.
+    - `session` (AsyncSession, optional): A database session, or `None` when inserts are batched.
 
     Returns:
     - `ScoreRead`: The created score object.
 
     Raises:
+    - `HTTPException` 404: If the student with the given ID is not found.
+    - `Overloaded` (503): If a batch could not be admitted by the write gate.
     - `HTTPException` 500: If there is an internal server error.
     """
     try:
-        new_score = ScoreModel(score=score.score, student_id=score.student_id)
-        session.add(new_score)
+        if score_batcher is not None:
+            return await score_batcher.add(score)
+
+        rows = await insert_scores(session, [score])
+        if isinstance(rows[0], ScoreRejected):
+            raise rows[0]
+
         await session.commit()
-        await session.refresh(new_score)
-        return new_score
+        await publish_score_changes(created_changes(rows))
+        return rows[0]
+    except StudentNotFound:
+        raise HTTPException(status_code=404, detail="Student not found")
+    except Overloaded:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/bulk", response_model=ScoreBulkResult)
+async def add_scores_bulk(request: Request, session: AsyncSession = Depends(get_async_session)):
+    """
+    Add many scores in one request.
+
+    The body is a JSON array of `ScoreBase` objects, or a stream of them as NDJSON
+    (`Content-Type: application/x-ndjson`) or CSV with a header row (`Content-Type: text/csv`).
+    Rows are written in batches of `BULK_BATCH_SIZE` with one multi-row INSERT and one commit per batch.
+    Invalid rows and rows referencing unknown students are reported without aborting the rest of the upload.
+
+    Parameters:
+    - `request` (Request): The incoming request whose body holds the scores.
+    - `session` (AsyncSession): A database session.
+
+    Returns:
+    - `ScoreBulkResult`: Created and failed counts with a per-row result (created id or error).
+
+    Raises:
+    - `HTTPException` 400: If a JSON body is malformed or is not an array.
+    - `HTTPException` 500: If there is an internal server error.
+    """
+    try:
+        results: List[ScoreBulkRow] = []
+        async for batch in iter_record_batches(request, BULK_BATCH_SIZE):
+            results.extend(await _insert_score_batch(session, batch))
+
+        created = sum(1 for row in results if row.id is not None)
+        return ScoreBulkResult(created=created, failed=len(results) - created, results=results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/", response_model=ScorePage)
+async def list_scores(
+        student_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = Query(PAGE_SIZE_DEFAULT, ge=1),
+        cursor: Optional[str] = None,
+        session: AsyncSession = Depends(get_read_session)
+):
+    """
+    List scores in ID order, one page at a time.
+
+    Pages are fetched with keyset pagination on `id`, so every page costs the same no matter how deep it is.
+
+    Parameters:
+    - `student_id` (int, optional): Only return scores of this student.
+    - `since` (datetime, optional): Only return scores created at or after this time.
+    - `until` (datetime, optional): Only return scores created before this time.
+    - `limit` (int): The page size, capped at `PAGE_SIZE_MAX`.
+    - `cursor` (str, optional): The `next_cursor` of the previous page.
+    - `session` (AsyncSession): A database session.
+
+    Returns:
+    - `ScorePage`: The scores of the page and the cursor of the next one, if any.
+
+    Raises:
+    - `HTTPException` 400: If the cursor is invalid.
+    - `HTTPException` 500: If there is an internal server error.
+    """
+    try:
+        after_id = decode_cursor(cursor)
+        limit = page_size(limit)
+
+        result = await session.execute(_score_page_query(limit, after_id, student_id, since, until))
+        scores = result.all()
+
+        next_cursor = encode_cursor(scores[limit - 1].id) if len(scores) > limit else None
+        return ORJSONResponse({"items": row_dicts(scores[:limit]), "next_cursor": next_cursor})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/{score_id}", response_model=ScoreRead)
-async def get_score(score_id: int, session: AsyncSession = Depends(get_async_session)):
+async def get_score(score_id: int, request: Request, session: AsyncSession = Depends(get_read_session)):
     """
     Read a score by ID.
 
+    The response carries an `ETag` and a `Last-Modified` header. A request whose `If-None-Match` or
+    `If-Modified-Since` header matches the current version gets `304 Not Modified` without a body.
+
     Parameters:
     - `score_id` (int): The ID of the score to retrieve.
+    - `request` (Request): The request, for its conditional headers.
     - `session` (AsyncSession): A database session.
 
     Returns:
@@ -54,15 +180,32 @@ async def get_score(score_id: int, session: AsyncSession = Depends(get_async_ses
     - `HTTPException` 404: If the score with the given ID is not found.
     - `HTTPException` 500: If there is an internal server error.
     """
+    async def load_score():
+        result = await session.execute(_score_query(score_id))
+        score = result.one_or_none()
+        if not score:
+            return None
+        return to_jsonable(score._asdict())
+
     try:
-        stmt = select(ScoreModel).where(ScoreModel.id == score_id)
-        result = await session.execute(stmt)
-        score = result.scalar_one_or_none()
+        if is_conditional(request):
+            version = await cache.peek(score_key(score_id))
+            if version is None:
+                result = await session.execute(_score_version_query(score_id))
+                version = result.one_or_none()
+                if not version:
+                    raise NoResultFound
+                version = version._mapping
+            etag, last_modified = _score_validators(version)
+            if is_not_modified(request, etag, last_modified):
+                return not_modified(etag, last_modified)
+
+        score = await cache.get_or_load(score_key(score_id), load_score, replica_lag(session))
 
         if not score:
             raise NoResultFound
 
-        return score
+        return ORJSONResponse(score, headers=validator_headers(*_score_validators(score)))
     except NoResultFound:
         raise HTTPException(status_code=404, detail="Score not found")
     except Exception as e:
@@ -87,19 +230,50 @@ async def update_score(score_id: int, score: ScoreBase, session: AsyncSession =
     - `HTTPException` 500: If there is an internal server error.
     """
     try:
-        query = await session.execute(select(ScoreModel).where(ScoreModel.id == score_id))
-        existing_score = query.scalars().first()
+        # The locked subquery yields the pre-update values, which the score stats need, in the same statement.
+        old = (
+            select(ScoreModel.id, ScoreModel.score, ScoreModel.student_id)
+            .where(ScoreModel.id == score_id)
+            .with_for_update()
+            .subquery("old")
+        )
+        stmt = (
+            update(ScoreModel.__table__)
+            .where(ScoreModel.id == old.c.id)
+            .values(**score.model_dump(exclude_unset=True))
+            .returning(
+                *ScoreModel.__table__.c, old.c.score.label("old_score"), old.c.student_id.label("old_student_id")
+            )
+        )
+        result = await session.execute(stmt)
+        updated_score = result.one_or_none()
 
-        if not score:
+        if not updated_score:
             raise HTTPException(status_code=404, detail="Score not found")
 
-        for key, value in score.dict(exclude_unset=True).items():
-            setattr(existing_score, key, value)
-
+        await record_score_updated(
+            session,
+            score_id,
+            updated_score.old_student_id,
+            updated_score.old_score,
+            updated_score.student_id,
+            updated_score.score,
+        )
+        changes = [ScoreChange(
+            "updated",
+            score_id,
+            updated_score.student_id,
+            updated_score.score,
+            updated_score.old_student_id,
+            updated_score.old_score,
+        )]
+        await notify_score_changes(session, changes)
         await session.commit()
-        await session.refresh(existing_score)
+        await publish_score_changes(changes)
 
-        return existing_score
+        return updated_score
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -121,15 +295,94 @@ async def delete_score(score_id: int, session: AsyncSession = Depends(get_async_
     - `HTTPException` 500: If there is an internal server error.
     """
     try:
-        query = await session.execute(select(ScoreModel).where(ScoreModel.id == score_id))
-        score = query.scalars().first()
+        stmt = (
+            delete(ScoreModel.__table__)
+            .where(ScoreModel.id == score_id)
+            .returning(ScoreModel.id, ScoreModel.student_id, ScoreModel.score)
+        )
+        result = await session.execute(stmt)
+        score = result.one_or_none()
 
         if not score:
             raise HTTPException(status_code=404, detail="Score not found")
 
-        await session.delete(score)
+        await record_score_removed(session, score.id, score.student_id, score.score)
+        changes = [ScoreChange("deleted", score.id, score.student_id, score.score)]
+        await notify_score_changes(session, changes)
         await session.commit()
+        await publish_score_changes(changes)
 
         return {"detail": "Score deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _insert_score_batch(session: AsyncSession, batch: List[Record]) -> List[ScoreBulkRow]:
+    results = {}
+    valid = []
+    for index, payload, error in batch:
+        if error:
+            results[index] = ScoreBulkRow(index=index, error=error)
+            continue
+        try:
+            valid.append((index, ScoreBase.model_validate(payload)))
+        except ValidationError as e:
+            results[index] = ScoreBulkRow(index=index, error=format_validation_error(e))
+
+    if valid:
+        rows = await insert_scores(session, [score for _, score in valid])
+        await session.commit()
+        await publish_score_changes(created_changes(rows))
+
+        for (index, _), row in zip(valid, rows):
+            if isinstance(row, ScoreRejected):
+                results[index] = ScoreBulkRow(index=index, error=str(row))
+            else:
+                results[index] = ScoreBulkRow(index=index, id=row.id)
+
+    return [results[index] for index, _, _ in batch]
+
+
+def _score_query(score_id: int) -> Select:
+    return select(*SCORE_COLUMNS).where(ScoreModel.id == score_id)
+
+
+def _score_version_query(score_id: int) -> Select:
+    return select(ScoreModel.id, ScoreModel.created_at, ScoreModel.updated_at).where(ScoreModel.id == score_id)
+
+
+def _score_validators(version: Mapping) -> Tuple[str, datetime]:
+    # `version` is a score row, or its cached JSON-compatible form.
+    created_at = parse_timestamp(version["created_at"])
+    updated_at = parse_timestamp(version["updated_at"])
+    return make_etag(version["id"], created_at, updated_at), updated_at or created_at
+
+
+def _score_page_query(
+        limit: int,
+        after_id: Optional[int],
+        student_id: Optional[int],
+        since: Optional[datetime],
+        until: Optional[datetime]
+) -> Select:
+    stmt = select(*SCORE_COLUMNS).order_by(ScoreModel.id).limit(limit + 1)
+    if after_id is not None:
+        stmt = stmt.where(ScoreModel.id > after_id)
+    if student_id is not None:
+        stmt = stmt.where(ScoreModel.student_id == student_id)
+    if since is not None:
+        stmt = stmt.where(ScoreModel.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(ScoreModel.created_at < until)
+    return stmt
+
+
+# A score by ID and the first and later pages of the list.
+warm_up_statements.extend([
+    _score_query(0),
+    _score_version_query(0),
+    _score_page_query(PAGE_SIZE_DEFAULT, None, None, None, None),
+    _score_page_query(PAGE_SIZE_DEFAULT, 0, None, None, None),
+])
@@ -1,22 +1,37 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, ConfigDict
 
 
 class ScoreBase(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     score: int
     student_id: Optional[int] = None
 
-    class Config:
-        orm_mode = True
-
 
 class ScoreRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     score: int
-    student_id: int
+    student_id: Optional[int] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-    class Config:
-        orm_mode = True
+
+class ScoreBulkRow(BaseModel):
+    index: int
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class ScoreBulkResult(BaseModel):
+    created: int
+    failed: int
+    results: List[ScoreBulkRow]
+
+
+class ScorePage(BaseModel):
+    items: List[ScoreRead]
+    next_cursor: Optional[str] = None
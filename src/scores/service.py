@@ -0,0 +1,94 @@
+from typing import List, Sequence, Union
+
+from sqlalchemy import insert, select
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Score as ScoreModel
+from .schemas import ScoreBase, ScoreRead
+from .signals import ScoreChange
+from ..feed.hub import notify_score_changes
+from ..serialization import schema_columns
+from ..students.models import Student as StudentModel
+from ..students.stats import record_scores_added
+
+SCORE_COLUMNS = schema_columns(ScoreModel.__table__, ScoreRead)
+
+
+STUDENT_FOREIGN_KEY = "scores_student_id_fkey"
+
+
+class ScoreRejected(Exception):
+    """Raised for a score the database refused to store, e.g. one that falls outside of every partition."""
+
+
+class StudentNotFound(ScoreRejected):
+    """Raised for a score that references a student that does not exist."""
+
+    def __init__(self):
+        super().__init__("Student not found")
+
+
+async def insert_scores(session: AsyncSession, scores: Sequence[ScoreBase]) -> List[Union[Row, ScoreRejected]]:
+    """
+    Insert scores with one multi-row INSERT, fold them into the student stats and queue their change feed
+    notifications, without committing.
+
+    Must be the only work of the session's transaction: if the INSERT fails, e.g. because a student is deleted
+    concurrently, the transaction is rolled back and the scores are retried one by one.
+
+    Returns:
+    - `List[Union[Row, ScoreRejected]]`: The inserted rows (the `ScoreRead` columns) in the order of `scores`,
+      or why a score was not inserted: `StudentNotFound` when its student does not exist.
+    """
+    student_ids = {score.student_id for score in scores if score.student_id is not None}
+    if student_ids:
+        query = await session.execute(select(StudentModel.id).where(StudentModel.id.in_(student_ids)))
+        existing_ids = set(query.scalars())
+    else:
+        existing_ids = set()
+
+    results: List[Union[Row, ScoreRejected]] = [StudentNotFound() for _ in scores]
+    rows = [
+        (index, {"score": score.score, "student_id": score.student_id})
+        for index, score in enumerate(scores)
+        if score.student_id is None or score.student_id in existing_ids
+    ]
+    if not rows:
+        return results
+
+    stmt = insert(ScoreModel).returning(*SCORE_COLUMNS, sort_by_parameter_order=True)
+    try:
+        query = await session.execute(stmt, [values for _, values in rows])
+        for (index, _), row in zip(rows, query):
+            results[index] = row
+    except IntegrityError:
+        # E.g. a student was removed after the lookup above; retry row by row so only the offending rows fail.
+        await session.rollback()
+        for index, values in rows:
+            try:
+                async with session.begin_nested():
+                    query = await session.execute(insert(ScoreModel).returning(*SCORE_COLUMNS), values)
+                    results[index] = query.one()
+            except IntegrityError as e:
+                results[index] = _rejection(e)
+
+    inserted = [row for row in results if not isinstance(row, ScoreRejected)]
+    await record_scores_added(session, [(row.id, row.student_id, row.score) for row in inserted])
+    await notify_score_changes(session, created_changes(results))
+    return results
+
+
+def created_changes(rows: Sequence[Union[Row, ScoreRejected]]) -> List[ScoreChange]:
+    return [
+        ScoreChange("created", row.id, row.student_id, row.score) for row in rows if not isinstance(row, ScoreRejected)
+    ]
+
+
+def _rejection(error: IntegrityError) -> ScoreRejected:
+    # The asyncpg exception, behind the DBAPI one, names the violated constraint.
+    cause = error.orig.__cause__
+    if getattr(cause, "constraint_name", None) == STUDENT_FOREIGN_KEY:
+        return StudentNotFound()
+    return ScoreRejected(getattr(cause, "message", None) or str(error.orig))
@@ -0,0 +1,40 @@
+import inspect
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, Sequence, Union
+
+
+@dataclass(frozen=True)
+class ScoreChange:
+    """
+    A committed change to a single score.
+
+    For deletions `student_id` and `score` hold the removed values; `old_student_id` and `old_score`
+    are only set for updates.
+    """
+    action: str  # "created", "updated" or "deleted"
+    score_id: int
+    student_id: Optional[int]
+    score: Optional[int]
+    old_student_id: Optional[int] = None
+    old_score: Optional[int] = None
+
+
+ScoreChangeListener = Callable[[Sequence[ScoreChange]], Union[None, Awaitable[None]]]
+
+_listeners: List[ScoreChangeListener] = []
+
+
+def on_score_change(listener: ScoreChangeListener) -> ScoreChangeListener:
+    """Register a listener that is called with every batch of committed score changes."""
+    _listeners.append(listener)
+    return listener
+
+
+async def publish_score_changes(changes: Sequence[ScoreChange]) -> None:
+    """Notify every listener about score changes. Call this once the changes are committed."""
+    if not changes:
+        return
+    for listener in _listeners:
+        result = listener(changes)
+        if inspect.isawaitable(result):
+            await result
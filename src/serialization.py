@@ -0,0 +1,27 @@
+"""
+Fast path for read responses.
+
+Rows selected from the app's own tables are trusted: when the selected columns are exactly the fields of the
+response schema, the rows are turned into plain dicts and rendered with orjson (`ORJSONResponse`), without
+building ORM objects or running Pydantic validation on them.
+"""
+from typing import Any, Iterable, List, Type
+
+import orjson
+from pydantic import BaseModel
+from sqlalchemy import Column, Table
+from sqlalchemy.engine import Row
+
+
+def schema_columns(table: Table, schema: Type[BaseModel]) -> List[Column]:
+    """The columns of `table` that are fields of `schema`, in the order of the schema's fields."""
+    return [table.c[name] for name in schema.model_fields if name in table.c]
+
+
+def row_dicts(rows: Iterable[Row]) -> List[dict]:
+    return [row._asdict() for row in rows]
+
+
+def to_jsonable(value: Any) -> Any:
+    """Convert trusted row data to JSON-compatible values, exactly as the response would render them."""
+    return orjson.loads(orjson.dumps(value))
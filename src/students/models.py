@@ -1,10 +1,22 @@
-from sqlalchemy import Column, Integer, String, TIMESTAMP, func
+from sqlalchemy import BigInteger, Column, ForeignKey, Index, Integer, String, TIMESTAMP, func
 from sqlalchemy.orm import relationship
 from ..database import Base
 
 
 class Student(Base):
     __tablename__ = "students"
+    # Trigram indexes for the substring and similarity matching of `GET /student/search`.
+    __table_args__ = (
+        Index(
+            "ix_students_first_name_trgm", "first_name",
+            postgresql_using="gin", postgresql_ops={"first_name": "gin_trgm_ops"}
+        ),
+        Index(
+            "ix_students_last_name_trgm", "last_name",
+            postgresql_using="gin", postgresql_ops={"last_name": "gin_trgm_ops"}
+        ),
+        Index("ix_students_email_trgm", "email", postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String)
@@ -12,7 +24,25 @@ class Student(Base):
     email = Column(String, unique=True, index=True)
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, onupdate=func.now(), nullable=True)
-    scores = relationship("Score", back_populates="student", lazy="selectin")
+    # Scores are never loaded implicitly: reads that return them select them explicitly.
+    scores = relationship("Score", back_populates="student", lazy="raise")
 
     def __repr__(self):
         return f"{self.first_name} {self.last_name}"
+
+
+class StudentScoreStats(Base):
+    __tablename__ = "student_score_stats"
+
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), primary_key=True)
+    score_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(BigInteger, nullable=False, default=0)
+    score_sum_squares = Column(BigInteger, nullable=False, default=0)
+    min_score = Column(Integer, nullable=True)
+    max_score = Column(Integer, nullable=True)
+    latest_score_id = Column(Integer, nullable=True)
+    latest_score = Column(Integer, nullable=True)
+    last_updated = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"{self.student_id}: {self.score_count} scores"
@@ -1,18 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from datetime import datetime
+from typing import List, Literal, Mapping, Optional, Set, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
+from pydantic import ValidationError
+from sqlalchemy import (
+    ARRAY, Integer, Select, String, any_, bindparam, delete, func, insert, literal, literal_column, or_, select, true,
+    union, update
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from .models import Student as StudentModel
-from .schemas import StudentRead, StudentUpdate, StudentCreate
-from ..database import get_async_session
+from .models import Student as StudentModel, StudentScoreStats as StatsModel
+from .schemas import (
+    StudentBatch, StudentBatchRequest, StudentBulkResult, StudentBulkRow, StudentPage, StudentProjection,
+    StudentRead, StudentSearchResult, StudentStats, StudentUpdate, StudentCreate
+)
+from ..bulk import Record, format_validation_error, iter_record_batches
+from ..cache import cache, notify_invalidation, student_key
+from ..conditional import (
+    epoch_microseconds, is_conditional, is_not_modified, make_etag, not_modified, parse_timestamp, validator_headers
+)
+from ..config import BULK_BATCH_SIZE, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, SEARCH_CANDIDATES
+from ..database import get_async_session, get_read_session, read_only, replica_lag, warm_up_statements
+from ..feed.hub import notify_score_changes
+from ..pagination import decode_cursor, encode_cursor, page_size
+from ..serialization import row_dicts, schema_columns, to_jsonable
+from ..scores import partitions
+from ..scores.models import Score as ScoreModel
+from ..scores.schemas import ScoreRead
+from ..scores.signals import ScoreChange, publish_score_changes
 
 router = APIRouter(
     prefix="/student",
     tags=["Student"]
 )
 
+STUDENT_FIELDS = ("id", "first_name", "last_name", "email", "scores")
+STUDENT_COLUMNS = schema_columns(StudentModel.__table__, StudentRead)
+SCORE_COLUMNS = schema_columns(ScoreModel.__table__, ScoreRead)
+
 
 @router.post("/", response_model=StudentRead)
 async def add_student(student: StudentCreate, session: AsyncSession = Depends(get_async_session)):
@@ -30,43 +58,410 @@ async def add_student(student: StudentCreate, session: AsyncSession = Depends(ge
     - `HTTPException` 500: If there is an internal server error.
     """
     try:
-        new_student = StudentModel(**student.dict())
-        session.add(new_student)
+        stmt = insert(StudentModel.__table__).values(**student.model_dump()).returning(*StudentModel.__table__.c)
+        result = await session.execute(stmt)
+        new_student = result.one()
 
         await session.commit()
-        await session.refresh(new_student)
-        return new_student
+        return {**new_student._mapping, "scores": []}
     except IntegrityError:
         raise HTTPException(status_code=400, detail="Email already exists. Please use a different email.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/{student_id}", response_model=StudentRead)
-async def get_student(student_id: int, session: AsyncSession = Depends(get_async_session)):
+@router.post("/bulk", response_model=StudentBulkResult)
+async def add_students_bulk(
+        request: Request,
+        on_conflict: Literal["update", "skip"] = "update",
+        session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Import many students in one request, upserting on email.
+
+    The body is a JSON array of `StudentCreate` objects, or a stream of them as NDJSON
+    (`Content-Type: application/x-ndjson`) or CSV with a header row (`Content-Type: text/csv`).
+    Rows are written in batches of `BULK_BATCH_SIZE`, each with a single `INSERT ... ON CONFLICT (email)`
+    statement and one commit.
+
+    Parameters:
+    - `request` (Request): The incoming request whose body holds the students.
+    - `on_conflict` (str): `update` overwrites the names of existing students with the same email,
+      `skip` leaves them untouched.
+    - `session` (AsyncSession): A database session.
+
+    Returns:
+    - `StudentBulkResult`: Inserted, updated, skipped and failed counts with a per-row result.
+      Existing students whose data did not change are reported as skipped.
+
+    Raises:
+    - `HTTPException` 400: If a JSON body is malformed or is not an array.
+    - `HTTPException` 500: If there is an internal server error.
+    """
+    try:
+        results: List[StudentBulkRow] = []
+        seen_emails: Set[str] = set()
+        async for batch in iter_record_batches(request, BULK_BATCH_SIZE):
+            results.extend(await _upsert_student_batch(session, batch, on_conflict, seen_emails))
+
+        counts = {status: 0 for status in ("inserted", "updated", "skipped", "error")}
+        for row in results:
+            counts[row.status] += 1
+
+        return StudentBulkResult(
+            inserted=counts["inserted"],
+            updated=counts["updated"],
+            skipped=counts["skipped"],
+            failed=counts["error"],
+            results=results,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/", response_model=StudentPage)
+async def list_students(
+        limit: int = Query(PAGE_SIZE_DEFAULT, ge=1),
+        cursor: Optional[str] = None,
+        session: AsyncSession = Depends(get_read_session)
+):
+    """
+    List students in ID order, one page at a time.
+
+    Pages are fetched with keyset pagination on `id`, so every page costs the same no matter how deep it is.
+
+    Parameters:
+    - `limit` (int): The page size, capped at `PAGE_SIZE_MAX`.
+    - `cursor` (str, optional): The `next_cursor` of the previous page.
+    - `session` (AsyncSession): A database session.
+
+    Returns:
+    - `StudentPage`: The students of the page with their scores and the cursor of the next page, if any.
+
+    Raises:
+    - `HTTPException` 400: If the cursor is invalid.
+    - `HTTPException` 500: If there is an internal server error.
+    """
+    try:
+        after_id = decode_cursor(cursor)
+        limit = page_size(limit)
+
+        result = await session.execute(_student_page_query(limit, after_id))
+        students = result.all()
+
+        next_cursor = encode_cursor(students[limit - 1].id) if len(students) > limit else None
+        items = row_dicts(students[:limit])
+        await _attach_scores(session, items)
+        return ORJSONResponse({"items": items, "next_cursor": next_cursor})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/search", response_model=List[StudentSearchResult])
+async def search_students(
+        q: str = Query(..., min_length=3),
+        limit: int = Query(PAGE_SIZE_DEFAULT, ge=1),
+        session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Find students by part of their first name, last name or email.
+
+    A student matches when a field contains `q` (case-insensitive) or has a word similar to it, so small
+    typos are tolerated. Both lookups use the trigram indexes on the three fields; scores are not loaded.
+    Only the first `SEARCH_CANDIDATES` matches of each field are ranked, so a fragment that most students
+    match (e.g. an email domain) costs about as much as a rare one.
+
+    Parameters:
+    - `q` (str): The text to look for, at least 3 characters (the shortest a trigram index can look up).
+    - `limit` (int): The maximum number of students to return, capped at `PAGE_SIZE_MAX`.
+    - `session` (AsyncSession): A database session.
+
+    Returns:
+    - `List[StudentSearchResult]`: The matching students, most similar first, with their similarity to `q`
+      between 0 and 1.
+
+    Raises:
+    - `HTTPException` 500: If there is an internal server error.
+    """
+    try:
+        columns = (StudentModel.first_name, StudentModel.last_name, StudentModel.email)
+        term = literal(q, String)
+        pattern = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        similarity = func.greatest(*(func.word_similarity(term, column) for column in columns))
+        limit = page_size(limit)
+
+        # Ranking every match sorts most of the table for a fragment like "gmail", so each lookup contributes
+        # at most `candidates` matches, in whatever order the scan finds them, and only those are
+        # ranked. Substring and similarity matches are capped separately so that fuzzy matches cannot crowd out
+        # the fields that contain `q`. `q <% column`: `column` has a word similar to `q`, above
+        # `pg_trgm.word_similarity_threshold`.
+        candidates = max(SEARCH_CANDIDATES, limit)
+        matches = union(*(
+            select(StudentModel.id).where(condition).limit(candidates)
+            for column in columns
+            for condition in (column.ilike(pattern, escape="\\"), term.op("<%")(column))
+        )).subquery()
+
+        stmt = (
+            select(*STUDENT_COLUMNS, similarity.label("similarity"))
+            .join(matches, matches.c.id == StudentModel.id)
+            .order_by(similarity.desc(), StudentModel.id)
+            .limit(limit)
+        )
+        result = await session.execute(stmt)
+        return ORJSONResponse(row_dicts(result))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/batch", response_model=StudentBatch)
+async def get_students_batch(
+        ids: str = Query(..., description="Comma-separated student IDs, e.g. `3,1,2`."),
+        session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Read several students with their scores, in two queries however many there are.
+
+    Parameters:
+    - `ids` (str): Comma-separated student IDs, at most `PAGE_SIZE_MAX`. Use `POST /student/batch` for
+      lists too long for a URL.
+    - `session` (AsyncSession): A database session.
+
+    Returns:
+    - `StudentBatch`: The students found, in the requested order without repeats, and the requested IDs
+      that do not exist.
+
+    Raises:
+    - `HTTPException` 400: If an ID is not an integer or too many IDs are requested.
+    - `HTTPException` 500: If there is an internal server error.
+    """
+    try:
+        student_ids = []
+        for value in ids.split(","):
+            if value.strip():
+                try:
+                    student_ids.append(int(value))
+                except ValueError:
+                    raise HTTPException(status_code=400, detail=f"Invalid student ID: {value.strip()}")
+        return await _read_students(session, student_ids)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/batch", response_model=StudentBatch)
+@read_only
+async def post_students_batch(batch: StudentBatchRequest, session: AsyncSession = Depends(get_read_session)):
+    """
+    Read several students with their scores, like `GET /student/batch`, with the IDs in the request body.
+
+    Parameters:
+    - `batch` (StudentBatchRequest): The student IDs, at most `PAGE_SIZE_MAX`.
+    - `session` (AsyncSession): A database session.
+
+    Returns:
+    - `StudentBatch`: The students found, in the requested order without repeats, and the requested IDs
+      that do not exist.
+
+    Raises:
+    - `HTTPException` 400: If too many IDs are requested.
+    - `HTTPException` 500: If there is an internal server error.
+    """
+    try:
+        return await _read_students(session, batch.ids)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{student_id}", response_model=StudentProjection, response_model_exclude_unset=True)
+async def get_student(
+        student_id: int,
+        request: Request,
+        include_scores: bool = True,
+        fields: Optional[str] = None,
+        session: AsyncSession = Depends(get_read_session)
+):
     """
     Read a student by ID.
 
+    A student with scores is read through the cache. Without scores, only the requested columns are
+    selected, in a single query.
+
+    The response carries an `ETag` and a `Last-Modified` header, which follow the student's row and, when the
+    scores are included, the student's scores. A request whose `If-None-Match` or `If-Modified-Since` header
+    matches the current version gets `304 Not Modified` after a version lookup, without reading the scores.
+
     Parameters:
     - `student_id` (int): The ID of the student to retrieve.
+    - `request` (Request): The request, for its conditional headers.
+    - `include_scores` (bool): Whether to return the student's scores.
+    - `fields` (str, optional): Comma-separated fields to return, e.g. `first_name,email`. Defaults to all of them.
     - `session` (AsyncSession): A database session.
 
     Returns:
-    - `StudentRead`: A retrieved student data.
+    - `StudentProjection`: A retrieved student data, with only the requested fields.
 
     Raises:
+    - `HTTPException` 400: If an unknown field is requested.
     - `HTTPException` 404: If the student with the given ID is not found.
     - `HTTPException` 500: If there is an internal server error.
     """
+    async def load_student():
+        result = await session.execute(_cached_student_query(student_id))
+        student = result.one_or_none()
+        if not student:
+            return None
+        student = student._asdict()
+        await _attach_scores(session, [student])
+        return to_jsonable(student)
+
     try:
-        stmt = select(StudentModel).options(selectinload(StudentModel.scores)).where(StudentModel.id == student_id)
-        result = await session.execute(stmt)
-        student = result.scalar_one_or_none()
+        selected = _selected_fields(fields, include_scores)
+
+        if is_conditional(request):
+            student = await cache.peek(student_key(student_id))
+            if student is not None:
+                version = _student_version(student)
+            else:
+                result = await session.execute(_student_version_query(student_id))
+                version = result.one_or_none()
+                if not version:
+                    raise NoResultFound
+                version = version._mapping
+            etag, last_modified = _student_validators(student_id, version, selected)
+            if is_not_modified(request, etag, last_modified):
+                return not_modified(etag, last_modified)
+
+        if "scores" in selected:
+            student = await cache.get_or_load(student_key(student_id), load_student, replica_lag(session))
+            if not student:
+                raise NoResultFound
+            headers = validator_headers(*_student_validators(student_id, _student_version(student), selected))
+            return ORJSONResponse({name: student[name] for name in selected}, headers=headers)
+
+        columns = [StudentModel.__table__.c[name] for name in selected]
+        result = await session.execute(
+            select(*columns, StudentModel.created_at, StudentModel.updated_at).where(StudentModel.id == student_id)
+        )
+        student = result.one_or_none()
 
         if not student:
             raise NoResultFound
 
-        return student
+        headers = validator_headers(*_student_validators(student_id, student._mapping, selected))
+        return ORJSONResponse({name: student._mapping[name] for name in selected}, headers=headers)
+    except HTTPException:
+        raise
+    except NoResultFound:
+        raise HTTPException(status_code=404, detail="Student not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{student_id}/stats", response_model=StudentStats)
+async def get_student_stats(student_id: int, session: AsyncSession = Depends(get_read_session)):
+    """
+    Read the score summary of a student.
+
+    The summary is maintained by every score write, so this is a single primary key lookup.
+
+    Parameters:
+    - `student_id` (int): The ID of the student.
+    - `session` (AsyncSession): A database session.
+
+    Returns:
+    - `StudentStats`: Score count, mean, standard deviation, minimum, maximum and latest score.
+
+    Raises:
+    - `HTTPException` 404: If the student with the given ID is not found.
+    - `HTTPException` 500: If there is an internal server error.
+    """
+    try:
+        result = await session.execute(_stats_query(student_id))
+        stats = result.scalar_one_or_none()
+
+        if not stats:
+            result = await session.execute(_student_id_query(student_id))
+            if result.scalar_one_or_none() is None:
+                raise NoResultFound
+            return StudentStats(student_id=student_id, count=0)
+
+        if not stats.score_count:
+            return StudentStats(student_id=student_id, count=0, last_updated=stats.last_updated)
+
+        mean = stats.score_sum / stats.score_count
+        variance = max(stats.score_sum_squares / stats.score_count - mean * mean, 0.0)
+        return StudentStats(
+            student_id=student_id,
+            count=stats.score_count,
+            mean=mean,
+            stddev=variance ** 0.5,
+            min=stats.min_score,
+            max=stats.max_score,
+            latest=stats.latest_score,
+            last_updated=stats.last_updated,
+        )
+    except NoResultFound:
+        raise HTTPException(status_code=404, detail="Student not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{student_id}/scores", response_model=List[ScoreRead])
+async def get_student_scores(
+        student_id: int,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = Query(PAGE_SIZE_DEFAULT, ge=1),
+        order: Literal["asc", "desc"] = "asc",
+        current_term: bool = False,
+        session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Read the score history of a student in time order.
+
+    The query is a range scan of the `(student_id, created_at)` index; with `current_term` it only reads the
+    partition of the current term.
+
+    Parameters:
+    - `student_id` (int): The ID of the student.
+    - `since` (datetime, optional): Only return scores created at or after this time.
+    - `until` (datetime, optional): Only return scores created before this time.
+    - `limit` (int): The maximum number of scores to return, capped at `PAGE_SIZE_MAX`.
+    - `order` (str): `asc` for oldest first, `desc` for newest first.
+    - `current_term` (bool): Only return scores of the current term, instead of `since` and `until`.
+    - `session` (AsyncSession): A database session.
+
+    Returns:
+    - `List[ScoreRead]`: The student's scores.
+
+    Raises:
+    - `HTTPException` 400: If `current_term` is combined with `since` or `until`.
+    - `HTTPException` 404: If the student with the given ID is not found.
+    - `HTTPException` 500: If there is an internal server error.
+    """
+    if current_term:
+        if since is not None or until is not None:
+            raise HTTPException(status_code=400, detail="current_term cannot be combined with since or until.")
+        since, until = partitions.current_term()
+
+    try:
+        result = await session.execute(_score_history_query(student_id, since, until, page_size(limit), order))
+        scores = result.all()
+
+        if not scores:
+            result = await session.execute(_student_id_query(student_id))
+            if result.scalar_one_or_none() is None:
+                raise NoResultFound
+
+        return ORJSONResponse(row_dicts(scores))
     except NoResultFound:
         raise HTTPException(status_code=404, detail="Student not found")
     except Exception as e:
@@ -91,21 +486,34 @@ async def update_student(student_id: int, student: StudentUpdate, session: Async
     - `HTTPException` 500: If there is an internal server error.
     """
     try:
-        stmt = select(StudentModel).options(selectinload(StudentModel.scores)).where(StudentModel.id == student_id)
+        values = student.model_dump(exclude_unset=True)
+        if values:
+            stmt = (
+                update(StudentModel.__table__)
+                .where(StudentModel.id == student_id)
+                .values(**values)
+                .returning(*StudentModel.__table__.c)
+            )
+        else:
+            stmt = select(*StudentModel.__table__.c).where(StudentModel.id == student_id)
         result = await session.execute(stmt)
-        existing_student = result.scalar_one_or_none()
+        existing_student = result.one_or_none()
 
         if not existing_student:
             raise HTTPException(status_code=404, detail="Student not found")
 
-        for key, value in student.dict(exclude_unset=True).items():
-            setattr(existing_student, key, value)
+        result = await session.execute(
+            select(*ScoreModel.__table__.c).where(ScoreModel.student_id == student_id).order_by(ScoreModel.id)
+        )
+        scores = result.all()
 
-        session.add(existing_student)
+        await notify_invalidation(session, [student_key(student_id)])
         await session.commit()
-        await session.refresh(existing_student)
+        await cache.invalidate([student_key(student_id)])
 
-        return existing_student
+        return {**existing_student._mapping, "scores": scores}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -127,16 +535,274 @@ async def delete_student(student_id: int, session: AsyncSession = Depends(get_as
     - `HTTPException` 500: If there is an internal server error.
     """
     try:
-        stmt = select(StudentModel).where(StudentModel.id == student_id)
+        # The student's scores are kept but detached from the student, as the ORM relationship used to do.
+        stmt = (
+            update(ScoreModel.__table__)
+            .where(ScoreModel.student_id == student_id)
+            .values(student_id=None)
+            .returning(ScoreModel.id, ScoreModel.score)
+        )
         result = await session.execute(stmt)
-        student = result.scalar_one_or_none()
+        detached = [ScoreChange("updated", score.id, None, score.score, student_id, score.score) for score in result]
 
-        if not student:
+        result = await session.execute(
+            delete(StudentModel.__table__).where(StudentModel.id == student_id).returning(StudentModel.id)
+        )
+        if result.scalar_one_or_none() is None:
+            await session.rollback()
             raise HTTPException(status_code=404, detail="Student not found")
 
-        await session.delete(student)
+        await notify_score_changes(session, detached)
+        await notify_invalidation(session, [student_key(student_id)])
         await session.commit()
+        await cache.invalidate([student_key(student_id)])
+        await publish_score_changes(detached)
 
         return {"detail": "Student deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _read_students(session: AsyncSession, student_ids: List[int]) -> ORJSONResponse:
+    student_ids = list(dict.fromkeys(student_ids))
+    if len(student_ids) > PAGE_SIZE_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {PAGE_SIZE_MAX} students can be read at once")
+
+    students = []
+    if student_ids:
+        result = await session.execute(_students_query(student_ids))
+        students = row_dicts(result)
+        await _attach_scores(session, students)
+
+    by_id = {student["id"]: student for student in students}
+    return ORJSONResponse({
+        "items": [by_id[student_id] for student_id in student_ids if student_id in by_id],
+        "missing": [student_id for student_id in student_ids if student_id not in by_id],
+    })
+
+
+async def _attach_scores(session: AsyncSession, students: List[dict]) -> None:
+    # One query for the scores of all the students, like `selectinload()` but without building ORM objects.
+    if not students:
+        return
+
+    by_id = {student["id"]: student for student in students}
+    for student in students:
+        student["scores"] = []
+
+    result = await session.execute(_scores_of_students_query(list(by_id)))
+    for score in result:
+        by_id[score.student_id]["scores"].append(score._asdict())
+
+
+def _cached_student_query(student_id: int) -> Select:
+    # The version columns are cached along with the student, for the validators; they are never returned.
+    return (
+        select(
+            *STUDENT_COLUMNS,
+            StudentModel.created_at,
+            StudentModel.updated_at,
+            StatsModel.last_updated.label("scores_updated_at"),
+        )
+        .outerjoin(StatsModel, StatsModel.student_id == StudentModel.id)
+        .where(StudentModel.id == student_id)
+    )
+
+
+def _student_version_query(student_id: int) -> Select:
+    # The same version as `_student_version()` derives from a cached student, without reading the scores' rows
+    # beyond their timestamps.
+    stamp = func.coalesce(ScoreModel.updated_at, ScoreModel.created_at)
+    scores = (
+        select(
+            func.count().label("score_count"),
+            func.sum(func.extract("epoch", stamp) * 1_000_000).label("score_stamps"),
+            func.max(stamp).label("latest_score_at"),
+        )
+        .where(ScoreModel.student_id == student_id)
+        .subquery("scores_version")
+    )
+    return (
+        select(
+            StudentModel.created_at,
+            StudentModel.updated_at,
+            StatsModel.last_updated.label("scores_updated_at"),
+            *scores.c,
+        )
+        .select_from(StudentModel)
+        .join(scores, true())
+        .outerjoin(StatsModel, StatsModel.student_id == StudentModel.id)
+        .where(StudentModel.id == student_id)
+    )
+
+
+def _student_version(student: dict) -> dict:
+    stamps = [parse_timestamp(score["updated_at"] or score["created_at"]) for score in student["scores"]]
+    return {
+        "created_at": student["created_at"],
+        "updated_at": student["updated_at"],
+        "scores_updated_at": student["scores_updated_at"],
+        "score_count": len(stamps),
+        "score_stamps": sum(epoch_microseconds(stamp) for stamp in stamps),
+        "latest_score_at": max(stamps, default=None),
+    }
+
+
+def _student_validators(student_id: int, version: Mapping, selected: List[str]) -> Tuple[str, Optional[datetime]]:
+    """
+    The `ETag` and `Last-Modified` of a student representation with the `selected` fields.
+
+    With scores, the entity tag covers the number of scores and the sum of their last change times, so adding,
+    editing, moving and deleting scores all change it. `Last-Modified` includes the last change of the student's
+    score summary, as a deleted score leaves no timestamp of its own.
+    """
+    created_at = parse_timestamp(version["created_at"])
+    updated_at = parse_timestamp(version["updated_at"])
+    parts = [student_id, selected, created_at, updated_at]
+    modified = [updated_at or created_at]
+    if "scores" in selected:
+        parts += [version["score_count"], int(version["score_stamps"] or 0)]
+        modified += [parse_timestamp(version["latest_score_at"]), parse_timestamp(version["scores_updated_at"])]
+    modified = [moment for moment in modified if moment is not None]
+    return make_etag(*parts), max(modified, default=None)
+
+
+def _student_id_query(student_id: int) -> Select:
+    return select(StudentModel.id).where(StudentModel.id == student_id)
+
+
+def _student_page_query(limit: int, after_id: Optional[int]) -> Select:
+    stmt = select(*STUDENT_COLUMNS).order_by(StudentModel.id).limit(limit + 1)
+    if after_id is not None:
+        stmt = stmt.where(StudentModel.id > after_id)
+    return stmt
+
+
+def _students_query(student_ids: List[int]) -> Select:
+    return select(*STUDENT_COLUMNS).where(StudentModel.id == any_(_id_array(student_ids)))
+
+
+def _scores_of_students_query(student_ids: List[int]) -> Select:
+    return (
+        select(*SCORE_COLUMNS)
+        .where(ScoreModel.student_id == any_(_id_array(student_ids)))
+        .order_by(ScoreModel.id)
+    )
+
+
+def _id_array(ids: List[int]):
+    # `= ANY(array)` instead of `IN (...)`: a single prepared statement serves any number of IDs.
+    return bindparam("ids", ids, type_=ARRAY(Integer))
+
+
+def _stats_query(student_id: int) -> Select:
+    return select(StatsModel).where(StatsModel.student_id == student_id)
+
+
+def _score_history_query(
+        student_id: int, since: Optional[datetime], until: Optional[datetime], limit: int, order: str
+) -> Select:
+    created_at = ScoreModel.created_at.desc() if order == "desc" else ScoreModel.created_at
+    stmt = select(*SCORE_COLUMNS).where(ScoreModel.student_id == student_id).order_by(created_at).limit(limit)
+    if since is not None:
+        stmt = stmt.where(ScoreModel.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(ScoreModel.created_at < until)
+    return stmt
+
+
+def _selected_fields(fields: Optional[str], include_scores: bool) -> List[str]:
+    if fields is None or not fields.strip():
+        selected = list(STUDENT_FIELDS)
+    else:
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = requested.difference(STUDENT_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        selected = [name for name in STUDENT_FIELDS if name in requested]
+
+    if not include_scores and "scores" in selected:
+        selected.remove("scores")
+    return selected
+
+
+async def _upsert_student_batch(
+        session: AsyncSession,
+        batch: List[Record],
+        on_conflict: str,
+        seen_emails: Set[str]
+) -> List[StudentBulkRow]:
+    results = {}
+    rows = {}
+    for index, payload, error in batch:
+        if error:
+            results[index] = StudentBulkRow(index=index, status="error", error=error)
+            continue
+        try:
+            student = StudentCreate.model_validate(payload)
+        except ValidationError as e:
+            results[index] = StudentBulkRow(index=index, status="error", error=format_validation_error(e))
+            continue
+
+        # ON CONFLICT cannot touch the same row twice in one statement, and a repeated email would
+        # silently overwrite the earlier row anyway, so duplicates within an upload are rejected.
+        if student.email in seen_emails:
+            results[index] = StudentBulkRow(index=index, status="error", error="Duplicate email in upload")
+            continue
+        seen_emails.add(student.email)
+        rows[student.email] = (index, student.model_dump())
+
+    if rows:
+        stmt = pg_insert(StudentModel).values([values for _, values in rows.values()])
+        if on_conflict == "update":
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[StudentModel.email],
+                set_={
+                    "first_name": stmt.excluded.first_name,
+                    "last_name": stmt.excluded.last_name,
+                    "updated_at": func.now(),
+                },
+                where=or_(
+                    StudentModel.first_name.is_distinct_from(stmt.excluded.first_name),
+                    StudentModel.last_name.is_distinct_from(stmt.excluded.last_name),
+                ),
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[StudentModel.email])
+
+        # xmax is zero only for freshly inserted row versions, which tells inserts and updates apart.
+        stmt = stmt.returning(StudentModel.id, StudentModel.email, literal_column("xmax = 0").label("inserted"))
+        query = await session.execute(stmt)
+        for student_id, email, inserted in query:
+            index, _ = rows.pop(email)
+            status = "inserted" if inserted else "updated"
+            results[index] = StudentBulkRow(index=index, status=status, id=student_id)
+        updated = [student_key(row.id) for row in results.values() if row.status == "updated"]
+        await notify_invalidation(session, updated)
+        await session.commit()
+        await cache.invalidate(updated)
+
+        # Whatever RETURNING did not report already existed and was left as is.
+        for index, _ in rows.values():
+            results[index] = StudentBulkRow(index=index, status="skipped")
+
+    return [results[index] for index, _, _ in batch]
+
+
+# The shapes of the most frequent reads: a student with its scores, the first and later pages of the list, and
+# the score history (all of it or of the current term) and stats of a student.
+warm_up_statements.extend([
+    _cached_student_query(0),
+    _student_version_query(0),
+    _students_query([0]),
+    _scores_of_students_query([0]),
+    _student_id_query(0),
+    _student_page_query(PAGE_SIZE_DEFAULT, None),
+    _student_page_query(PAGE_SIZE_DEFAULT, 0),
+    _score_history_query(0, None, None, PAGE_SIZE_DEFAULT, "asc"),
+    _score_history_query(0, None, None, PAGE_SIZE_DEFAULT, "desc"),
+    _score_history_query(0, *partitions.current_term(), PAGE_SIZE_DEFAULT, "asc"),
+    _stats_query(0),
+])
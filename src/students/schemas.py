@@ -1,5 +1,6 @@
+from datetime import datetime
 from typing import Optional, List
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from ..scores.schemas import ScoreRead
 
 
@@ -16,11 +17,68 @@ class StudentUpdate(BaseModel):
 
 
 class StudentRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     first_name: str
     last_name: str
     email: str
     scores: Optional[List[ScoreRead]] = []
 
-    class Config:
-        orm_mode = True
+
+class StudentProjection(BaseModel):
+    """A student with only the requested fields; fields that were not requested are left out of the response."""
+
+    id: Optional[int] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[str] = None
+    scores: Optional[List[ScoreRead]] = None
+
+
+class StudentSearchResult(BaseModel):
+    id: int
+    first_name: str
+    last_name: str
+    email: str
+    similarity: float
+
+
+class StudentBulkRow(BaseModel):
+    index: int
+    status: str
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class StudentBulkResult(BaseModel):
+    inserted: int
+    updated: int
+    skipped: int
+    failed: int
+    results: List[StudentBulkRow]
+
+
+class StudentPage(BaseModel):
+    items: List[StudentRead]
+    next_cursor: Optional[str] = None
+
+
+class StudentBatchRequest(BaseModel):
+    ids: List[int]
+
+
+class StudentBatch(BaseModel):
+    items: List[StudentRead]
+    missing: List[int]
+
+
+class StudentStats(BaseModel):
+    student_id: int
+    count: int
+    mean: Optional[float] = None
+    stddev: Optional[float] = None
+    min: Optional[int] = None
+    max: Optional[int] = None
+    latest: Optional[int] = None
+    last_updated: Optional[datetime] = None
@@ -0,0 +1,198 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import BigInteger, case, cast, delete, func, or_, select, text, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import StudentScoreStats as StatsModel
+from ..scores.models import Score as ScoreModel
+
+
+async def record_scores_added(
+        session: AsyncSession,
+        scores: Iterable[Tuple[int, Optional[int], Optional[int]]]
+) -> None:
+    """
+    Fold newly inserted scores into the per-student summaries.
+
+    Parameters:
+    - `session` (AsyncSession): The session of the transaction that inserted the scores.
+    - `scores` (Iterable): `(score_id, student_id, score)` tuples. Scores without a student or without a value
+      are not counted, like everywhere in the summaries.
+    """
+    totals: Dict[int, dict] = {}
+    for score_id, student_id, value in scores:
+        if student_id is None or value is None:
+            continue
+        row = totals.get(student_id)
+        if row is None:
+            totals[student_id] = {
+                "student_id": student_id,
+                "score_count": 1,
+                "score_sum": value,
+                "score_sum_squares": value * value,
+                "min_score": value,
+                "max_score": value,
+                "latest_score_id": score_id,
+                "latest_score": value,
+            }
+            continue
+        row["score_count"] += 1
+        row["score_sum"] += value
+        row["score_sum_squares"] += value * value
+        row["min_score"] = min(row["min_score"], value)
+        row["max_score"] = max(row["max_score"], value)
+        if score_id > row["latest_score_id"]:
+            row["latest_score_id"], row["latest_score"] = score_id, value
+
+    if not totals:
+        return
+
+    # Rows are upserted in student order so that concurrent batches lock them in the same order.
+    stmt = pg_insert(StatsModel).values([totals[student_id] for student_id in sorted(totals)])
+    excluded = stmt.excluded
+    is_newer = or_(StatsModel.latest_score_id.is_(None), excluded.latest_score_id > StatsModel.latest_score_id)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[StatsModel.student_id],
+        set_={
+            "score_count": StatsModel.score_count + excluded.score_count,
+            "score_sum": StatsModel.score_sum + excluded.score_sum,
+            "score_sum_squares": StatsModel.score_sum_squares + excluded.score_sum_squares,
+            "min_score": func.least(StatsModel.min_score, excluded.min_score),
+            "max_score": func.greatest(StatsModel.max_score, excluded.max_score),
+            "latest_score_id": case((is_newer, excluded.latest_score_id), else_=StatsModel.latest_score_id),
+            "latest_score": case((is_newer, excluded.latest_score), else_=StatsModel.latest_score),
+            "last_updated": func.now(),
+        },
+    )
+    await session.execute(stmt)
+
+
+async def record_score_removed(
+        session: AsyncSession,
+        score_id: int,
+        student_id: Optional[int],
+        value: Optional[int]
+) -> None:
+    """
+    Take a deleted score out of its student's summary.
+
+    Must run after the score row is gone, or has no value any more: when the score was the student's minimum,
+    maximum or latest one, that value is looked up again among the remaining scores.
+    """
+    if student_id is None or value is None:
+        return
+
+    stmt = update(StatsModel).where(StatsModel.student_id == student_id).values(
+        score_count=StatsModel.score_count - 1,
+        score_sum=StatsModel.score_sum - value,
+        score_sum_squares=StatsModel.score_sum_squares - value * value,
+        min_score=case((StatsModel.min_score == value, _min_score(student_id)), else_=StatsModel.min_score),
+        max_score=case((StatsModel.max_score == value, _max_score(student_id)), else_=StatsModel.max_score),
+        latest_score_id=case(
+            (StatsModel.latest_score_id == score_id, _latest_score(student_id, ScoreModel.id)),
+            else_=StatsModel.latest_score_id,
+        ),
+        latest_score=case(
+            (StatsModel.latest_score_id == score_id, _latest_score(student_id, ScoreModel.score)),
+            else_=StatsModel.latest_score,
+        ),
+        last_updated=func.now(),
+    )
+    await session.execute(stmt)
+
+
+async def record_score_updated(
+        session: AsyncSession,
+        score_id: int,
+        old_student_id: Optional[int],
+        old_value: Optional[int],
+        new_student_id: Optional[int],
+        new_value: Optional[int]
+) -> None:
+    """
+    Apply an edited score to the summaries. Must run after the score row has been updated.
+
+    A score that moved to another student, or that gained or lost its value, is removed from the old summary
+    and added to the new one.
+    """
+    if old_student_id != new_student_id or old_value is None or new_value is None:
+        await record_score_removed(session, score_id, old_student_id, old_value)
+        await record_scores_added(session, [(score_id, new_student_id, new_value)])
+        return
+
+    if old_student_id is None or old_value == new_value:
+        return
+
+    stmt = update(StatsModel).where(StatsModel.student_id == old_student_id).values(
+        score_sum=StatsModel.score_sum + (new_value - old_value),
+        score_sum_squares=StatsModel.score_sum_squares + (new_value * new_value - old_value * old_value),
+        min_score=case(
+            (StatsModel.min_score >= new_value, new_value),
+            (StatsModel.min_score == old_value, _min_score(old_student_id)),
+            else_=StatsModel.min_score,
+        ),
+        max_score=case(
+            (StatsModel.max_score <= new_value, new_value),
+            (StatsModel.max_score == old_value, _max_score(old_student_id)),
+            else_=StatsModel.max_score,
+        ),
+        latest_score=case((StatsModel.latest_score_id == score_id, new_value), else_=StatsModel.latest_score),
+        last_updated=func.now(),
+    )
+    await session.execute(stmt)
+
+
+async def rebuild_stats(session: AsyncSession) -> int:
+    """
+    Recompute every per-student summary from the `scores` table and commit.
+
+    Score writes are blocked while the summaries are rebuilt so that none of them is lost.
+
+    Returns:
+    - `int`: The number of students with a summary.
+    """
+    await session.execute(text(f"LOCK TABLE {ScoreModel.__tablename__} IN SHARE MODE"))
+    await session.execute(delete(StatsModel))
+
+    latest = aggregate_order_by(ScoreModel.id, ScoreModel.id.desc())
+    latest_value = aggregate_order_by(ScoreModel.score, ScoreModel.id.desc())
+    summaries = (
+        select(
+            ScoreModel.student_id,
+            func.count(ScoreModel.score),
+            func.coalesce(func.sum(ScoreModel.score), 0),
+            func.coalesce(func.sum(cast(ScoreModel.score, BigInteger) * ScoreModel.score), 0),
+            func.min(ScoreModel.score),
+            func.max(ScoreModel.score),
+            func.array_agg(latest)[1],
+            func.array_agg(latest_value)[1],
+        )
+        .where(ScoreModel.student_id.is_not(None), ScoreModel.score.is_not(None))
+        .group_by(ScoreModel.student_id)
+    )
+    columns = [
+        "student_id", "score_count", "score_sum", "score_sum_squares",
+        "min_score", "max_score", "latest_score_id", "latest_score",
+    ]
+    result = await session.execute(pg_insert(StatsModel).from_select(columns, summaries))
+    await session.commit()
+    return result.rowcount
+
+
+def _min_score(student_id: int):
+    return select(func.min(ScoreModel.score)).where(ScoreModel.student_id == student_id).scalar_subquery()
+
+
+def _max_score(student_id: int):
+    return select(func.max(ScoreModel.score)).where(ScoreModel.student_id == student_id).scalar_subquery()
+
+
+def _latest_score(student_id: int, column):
+    return (
+        select(column)
+        .where(ScoreModel.student_id == student_id, ScoreModel.score.is_not(None))
+        .order_by(ScoreModel.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
@@ -0,0 +1,203 @@
+import asyncio
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+from src.scores import batcher as batcher_module
+from src.scores.batcher import ScoreBatcher
+from src.scores.schemas import ScoreBase
+from src.scores.service import ScoreRejected, StudentNotFound
+
+MISSING_STUDENT = 404
+OUT_OF_RANGE = -1
+
+
+class StubSession:
+    def __init__(self, writes: List[list]):
+        self.writes = writes
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def commit(self):
+        self.writes.append("commit")
+
+
+class StubDatabase:
+    """
+    Stands in for the session and `insert_scores` of `ScoreBatcher._write`.
+
+    Each score gets a row with a distinct ID, except for scores of `MISSING_STUDENT` and `OUT_OF_RANGE`,
+    which are rejected the way the database rejects them. Writes wait for `release` when it is set.
+    """
+
+    def __init__(self):
+        self.batches: List[List[ScoreBase]] = []
+        self.writes: list = []
+        self.published: list = []
+        self.release = None
+        self.error = None
+        self.next_id = 1
+
+    def session(self):
+        return StubSession(self.writes)
+
+    async def insert_scores(self, session, scores):
+        self.batches.append(list(scores))
+        if self.release is not None:
+            await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        rows = []
+        for score in scores:
+            if score.student_id == MISSING_STUDENT:
+                rows.append(StudentNotFound())
+            elif score.score == OUT_OF_RANGE:
+                rows.append(ScoreRejected("no partition of relation \"scores\" found for row"))
+            else:
+                rows.append(SimpleNamespace(id=self.next_id, student_id=score.student_id, score=score.score))
+                self.next_id += 1
+        return rows
+
+    async def publish(self, changes):
+        self.published.extend(changes)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    stub = StubDatabase()
+    monkeypatch.setattr(batcher_module, "async_session_maker", stub.session)
+    monkeypatch.setattr(batcher_module, "insert_scores", stub.insert_scores)
+    monkeypatch.setattr(batcher_module, "publish_score_changes", stub.publish)
+    return stub
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, timeout=5))
+
+
+async def until(condition):
+    while not condition():
+        await asyncio.sleep(0)
+
+
+def test_each_caller_gets_its_own_row_or_error(database):
+    batcher = ScoreBatcher(max_wait=0.01, max_size=100)
+    scores = [
+        ScoreBase(student_id=1, score=90),
+        ScoreBase(student_id=MISSING_STUDENT, score=80),
+        ScoreBase(student_id=2, score=70),
+        ScoreBase(student_id=3, score=OUT_OF_RANGE),
+        ScoreBase(student_id=1, score=60),
+    ]
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.add(score) for score in scores), return_exceptions=True)
+
+    results = run(scenario())
+
+    assert len(database.batches) == 1 and database.writes == ["commit"]
+    assert [(row.student_id, row.score) for row in (results[0], results[2], results[4])] == [(1, 90), (2, 70), (1, 60)]
+    assert len({results[0].id, results[2].id, results[4].id}) == 3
+    assert isinstance(results[1], StudentNotFound)
+    assert type(results[3]) is ScoreRejected and "no partition" in str(results[3])
+    assert [change.score_id for change in database.published] == [results[0].id, results[2].id, results[4].id]
+    assert batcher.stats() == {"batches": 1, "scores": 5, "average_batch_size": 5.0, "pending": 0}
+
+
+def test_a_failed_write_fails_every_caller(database):
+    database.error = RuntimeError("connection lost")
+    batcher = ScoreBatcher(max_wait=0.01, max_size=100)
+
+    async def scenario():
+        return await asyncio.gather(
+            *(batcher.add(ScoreBase(student_id=student_id, score=50)) for student_id in (1, 2, 3)),
+            return_exceptions=True,
+        )
+
+    results = run(scenario())
+
+    assert all(result is database.error for result in results)
+    assert database.writes == [] and database.published == []
+    assert batcher.stats()["batches"] == 0
+
+
+def test_a_full_batch_is_written_without_waiting(database):
+    batcher = ScoreBatcher(max_wait=60, max_size=2)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.add(ScoreBase(student_id=1, score=score)) for score in range(5)))
+
+    # The fifth score waits for the 60 second timer; only the two full batches are written.
+    async def until_two_batches():
+        task = asyncio.ensure_future(scenario())
+        await until(lambda: len(database.batches) == 2)
+        pending = batcher.stats()["pending"]
+        await batcher.drain()
+        return pending, await task
+
+    pending, rows = run(until_two_batches())
+
+    assert pending == 1
+    assert [len(batch) for batch in database.batches] == [2, 2, 1]
+    assert [row.score for row in rows] == [0, 1, 2, 3, 4]
+
+
+def test_drain_resolves_every_pending_future(database):
+    batcher = ScoreBatcher(max_wait=60, max_size=3)
+    database.release = asyncio.Event()
+
+    async def scenario():
+        # Three scores form a full batch whose write is held back; two more wait for the 60 second timer.
+        callers = [
+            asyncio.ensure_future(batcher.add(ScoreBase(student_id=student_id, score=10)))
+            for student_id in (1, 2, MISSING_STUDENT, 4, 5)
+        ]
+        await until(lambda: len(database.batches) == 1 and batcher.stats()["pending"] == 2)
+
+        drained = asyncio.ensure_future(batcher.drain())
+        await until(lambda: len(database.batches) == 2)
+        assert batcher.stats()["pending"] == 0
+        assert not drained.done() and not any(caller.done() for caller in callers)
+
+        database.release.set()
+        await drained
+        assert all(caller.done() for caller in callers)
+        return [caller.exception() or caller.result() for caller in callers]
+
+    results = run(scenario())
+
+    assert [result.student_id for result in results if not isinstance(result, Exception)] == [1, 2, 4, 5]
+    assert isinstance(results[2], StudentNotFound)
+    assert database.writes == ["commit", "commit"]
+
+
+def test_drain_with_nothing_pending(database):
+    batcher = ScoreBatcher(max_wait=60, max_size=10)
+    run(batcher.drain())
+    assert database.batches == []
+
+
+def test_a_cancelled_caller_does_not_lose_the_others(database):
+    batcher = ScoreBatcher(max_wait=0.01, max_size=100)
+
+    async def scenario():
+        leaving = asyncio.ensure_future(batcher.add(ScoreBase(student_id=1, score=10)))
+        staying = asyncio.ensure_future(batcher.add(ScoreBase(student_id=2, score=20)))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        row = await staying
+        await batcher.drain()
+        return leaving, row
+
+    leaving, row = run(scenario())
+
+    assert leaving.cancelled()
+    assert (row.student_id, row.score) == (2, 20)
+    # The cancelled caller's score is written regardless.
+    assert [score.student_id for score in database.batches[0]] == [1, 2]
+    assert len(database.published) == 2
@@ -0,0 +1,89 @@
+import asyncio
+from typing import Iterable, List
+
+import pytest
+
+from src.bulk import _iter_csv_rows, iter_record_batches
+
+
+class FakeRequest:
+    """Streams a body in the given chunks, like `Request.stream()`."""
+
+    def __init__(self, chunks: Iterable[bytes], content_type: str = "text/csv"):
+        self.chunks = list(chunks)
+        self.headers = {"content-type": content_type}
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def split(body: bytes, size: int) -> List[bytes]:
+    return [body[start:start + size] for start in range(0, len(body), size)]
+
+
+def csv_rows(chunks: Iterable[bytes]) -> List[List[str]]:
+    async def collect():
+        return [values async for values in _iter_csv_rows(FakeRequest(chunks))]
+    return asyncio.run(collect())
+
+
+def records(chunks: Iterable[bytes], batch_size: int = 2) -> list:
+    async def collect():
+        return [record async for batch in iter_record_batches(FakeRequest(chunks), batch_size) for record in batch]
+    return asyncio.run(collect())
+
+
+BODY = (
+    'student_id,score,comment\r\n'
+    '1,90,"plain"\r\n'
+    '2,80,"a comma, inside"\r\n'
+    '3,70,"first line\r\nsecond line\r\n\r\nafter a blank line"\r\n'
+    '4,60,"say ""hi"", then\nleave"\r\n'
+    '5,50,"Zoë, naïve"\r\n'
+    '6,40,\r\n'
+).encode()
+
+EXPECTED = [
+    ["student_id", "score", "comment"],
+    ["1", "90", "plain"],
+    ["2", "80", "a comma, inside"],
+    ["3", "70", "first line\r\nsecond line\r\n\r\nafter a blank line"],
+    ["4", "60", 'say "hi", then\nleave'],
+    ["5", "50", "Zoë, naïve"],
+    ["6", "40", ""],
+]
+
+
+def test_csv_rows_in_one_chunk():
+    assert csv_rows([BODY]) == EXPECTED
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 11, 16, 64])
+def test_csv_rows_split_at_any_chunk_boundary(size):
+    # Chunk boundaries fall inside quoted fields, between doubled quotes, between "\r" and "\n" and inside
+    # multi-byte characters.
+    assert csv_rows(split(BODY, size)) == EXPECTED
+
+
+def test_csv_rows_split_at_every_single_position():
+    for position in range(1, len(BODY)):
+        assert csv_rows([BODY[:position], BODY[position:]]) == EXPECTED, position
+
+
+def test_csv_rows_without_final_newline():
+    assert csv_rows(split(b'a,b\n1,"x\ny"', 3)) == [["a", "b"], ["1", "x\ny"]]
+
+
+def test_csv_rows_unterminated_quote_takes_the_rest_of_the_body():
+    assert csv_rows(split(b'a,b\n1,"x\n2,y\n', 4)) == [["a", "b"], ["1", "x\n2,y\n"]]
+
+
+def test_csv_records_keep_their_index_and_report_bad_rows():
+    body = b'student_id,score\n1,90\n\n2\n"3","7\n0"\n'
+    for size in (1, 4, len(body)):
+        assert records(split(body, size)) == [
+            (0, {"student_id": "1", "score": "90"}, None),
+            (1, None, "Expected 2 columns, got 1"),
+            (2, {"student_id": "3", "score": "7\n0"}, None),
+        ]